@@ -1,58 +1,12 @@
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
 
-
-# ---------------------------
-# 1) Load + Chunk documents
-# ---------------------------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
-
-
-def chunk_text(text: str, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
-
-
-# ---------------------------
-# 2) Embeddings
-# ---------------------------
-def embed_texts(model, texts):
-    # returns numpy array shape: (num_texts, embedding_dim)
-    emb = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
-    return emb.astype("float32")
-
-
-# ---------------------------
-# 3) Build FAISS index
-# ---------------------------
-def build_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]  # e.g., 384
-    index = faiss.IndexFlatIP(dim)  # inner product (best with normalized vectors)
-    index.add(embeddings)
-    return index
-
-
-# ---------------------------
-# 4) Retrieve top chunks
-# ---------------------------
-def retrieve_top_chunks(index, model, query: str, chunks: list[str], k: int = 3):
-    q_emb = embed_texts(model, [query])  # shape (1, dim)
-    scores, ids = index.search(q_emb, k)
-
-    results = []
-    for idx, score in zip(ids[0], scores[0]):
-        results.append((int(idx), float(score), chunks[int(idx)]))
-    return results
+# 1) load + chunk, 2) embeddings, 3) FAISS index, 4) batched retrieval:
+# the shared helpers in rag/core.py (retrieve_batch: one encode + one
+# index.search for all questions, -1 ids for k > index size are dropped)
+from rag.core import build_faiss_index, chunk_text, embed_texts, load_text_file, retrieve_batch
+from rag.ollama_client import get_client
 
 
 # ---------------------------
@@ -74,25 +28,14 @@ QUESTION:
 ANSWER (clear and short):
 """.strip()
 
-    # Call Ollama CLI
-    result = subprocess.run(
-        ["ollama", "run", ollama_model, prompt],
-        capture_output=True,
-        text=True
-    )
-
-    if result.returncode != 0:
-        raise RuntimeError(f"Ollama error:\n{result.stderr}")
-
-    return result.stdout.strip()
+    # Call the local Ollama server (pooled keep-alive HTTP, no CLI process per answer)
+    return get_client().generate(prompt, model=ollama_model)
 
 
 # ---------------------------
 # 6) Full RAG Search + Answer
 # ---------------------------
-def rag_ask(index, embed_model, query: str, chunks: list[str], k: int = 3, ollama_model="llama3.2:3b"):
-    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k)
-
+def rag_ask(query: str, results, ollama_model="llama3.2:3b"):
     print("\n🔎 Query:", query)
     print("Top matches:\n")
     retrieved_texts = []
@@ -125,6 +68,12 @@ if __name__ == "__main__":
     index = build_faiss_index(chunk_embeddings)
     print(f"✅ FAISS index size: {index.ntotal} vectors")
 
-    # D) Ask questions (RAG)
-    rag_ask(index, embed_model, "What is RAG and how does it work?", chunks, k=3, ollama_model="llama3.2:3b")
-    rag_ask(index, embed_model, "Where do we store embeddings and why?", chunks, k=3, ollama_model="llama3.2:3b")
+    # D) Retrieve for all questions at once, then answer each (RAG)
+    questions = [
+        "What is RAG and how does it work?",
+        "Where do we store embeddings and why?",
+    ]
+    all_results = retrieve_batch(index, embed_model, questions, chunks, k=3)
+
+    for query, results in zip(questions, all_results):
+        rag_ask(query, results, ollama_model="llama3.2:3b")
@@ -1,75 +1,43 @@
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
+from rag.answer_cache import manifest_version
+from rag.embedders import load_backend
+from rag.index_store import load_or_build_index
+from rag.ollama_client import echo_stream, get_client
+from rag.packing import ContextPacker
+from rag.query_cache import QueryCache
+from rag.warmup import StartupTimer, format_warmup, warm_up
 
 
-# -------------------------------------------------
-# 1) Load document
-# -------------------------------------------------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
-
-
-# -------------------------------------------------
-# 2) Chunk document
-# -------------------------------------------------
-def chunk_text(text: str, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
-
-
-# -------------------------------------------------
-# 3) Create embeddings
-# -------------------------------------------------
-def embed_texts(model, texts):
-    embeddings = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )
-    return embeddings.astype("float32")
+# Startup stages, time-to-ready and the first query are timed separately
+startup = StartupTimer()
 
+# Repeated questions skip both query embedding and FAISS search
+query_cache = QueryCache(max_size=1024, ttl_seconds=3600)
 
-# -------------------------------------------------
-# 4) Build FAISS index
-# -------------------------------------------------
-def build_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]  # 384
-    index = faiss.IndexFlatIP(dim)  # cosine similarity (normalized)
-    index.add(embeddings)
-    return index
+# Overlapping / adjacent hits are merged, duplicates dropped, at most 1024 prompt tokens
+context_packer = ContextPacker(budget_tokens=1024)
 
 
 # -------------------------------------------------
-# 5) Retrieve top chunks
+# 1) Retrieve top chunks
 # -------------------------------------------------
-def retrieve_top_chunks(index, model, query: str, chunks, k=3):
-    query_embedding = embed_texts(model, [query])
-    scores, indices = index.search(query_embedding, k)
+def retrieve_top_chunks(index, model, query: str, chunks, k=3, index_version=None):
+    results = query_cache.retrieve_top_chunks(index, model, query, chunks, k=k, index_version=index_version)
 
-    retrieved_chunks = []
     print("\n🔎 Retrieved chunks:\n")
 
-    for rank, (idx, score) in enumerate(zip(indices[0], scores[0]), start=1):
+    for rank, (idx, score, chunk) in enumerate(results, start=1):
         print(f"--- Rank {rank} | score={score:.4f} ---")
-        print(chunks[idx])
+        print(chunk)
         print()
-        retrieved_chunks.append(chunks[idx])
 
-    return retrieved_chunks
+    return results
 
 
 # -------------------------------------------------
-# 6) Generate answer using Ollama
+# 2) Generate answer using Ollama
 # -------------------------------------------------
 def generate_answer_with_ollama(question: str, retrieved_chunks, model_name="llama3.2:3b"):
     context = "\n\n".join(retrieved_chunks)
@@ -89,27 +57,20 @@ QUESTION:
 ANSWER:
 """.strip()
 
-    result = subprocess.run(
-        ["ollama", "run", model_name, prompt],
-        capture_output=True,
-        text=True
-    )
-
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr)
-
-    return result.stdout.strip()
+    # shared pooled HTTP client: yields tokens as Ollama generates them
+    return get_client().generate_stream(prompt, model=model_name)
 
 
 # -------------------------------------------------
-# 7) RAG pipeline
+# 3) RAG pipeline
 # -------------------------------------------------
-def rag_answer(index, embed_model, query, chunks, k=3):
-    retrieved_chunks = retrieve_top_chunks(index, embed_model, query, chunks, k)
-    print("🤖 Generating answer with Ollama...\n")
-    answer = generate_answer_with_ollama(query, retrieved_chunks)
-    print("✅ Final Answer:\n")
-    print(answer)
+def rag_answer(index, embed_model, query, chunks, k=3, index_version=None):
+    results = retrieve_top_chunks(index, embed_model, query, chunks, k, index_version=index_version)
+    blocks = context_packer.pack(results)
+    print(context_packer.report() + "\n")
+
+    print("🤖 Answer from Ollama:\n")
+    echo_stream(startup.stream(generate_answer_with_ollama(query, [block["text"] for block in blocks])))
     print("\n" + "=" * 60 + "\n")
 
 
@@ -119,20 +80,22 @@ def rag_answer(index, embed_model, query, chunks, k=3):
 if __name__ == "__main__":
     print("🚀 Building RAG system...\n")
 
-    # Load + chunk
-    text = load_text_file("data.txt")
-    chunks = chunk_text(text)
-    print(f"✅ Total chunks created: {len(chunks)}")
-
-    # Embeddings
-    embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = embed_texts(embed_model, chunks)
-    print(f"✅ Embeddings shape: {embeddings.shape} (chunks, 384)")
-
-    # FAISS index
-    index = build_faiss_index(embeddings)
+    # Embedding model + persisted FAISS index (rebuilt only if data.txt changed)
+    with startup.stage("embed model"):
+        embed_model = load_backend()
+    with startup.stage("index"):
+        index, chunks = load_or_build_index("data.txt", embed_model, model_name=embed_model.name)
+    # manifest hash: changes whenever the index is rebuilt, keys the query cache
+    index_version = manifest_version()
     print(f"✅ FAISS index size: {index.ntotal}")
 
+    # Load the LLM and run the embedding model once now, not on the first question
+    with startup.stage("warm-up"):
+        warmup = warm_up(embed_model, "llama3.2:3b")
+    print(format_warmup(warmup, "llama3.2:3b"))
+    startup.ready()
+    print(startup.startup_report())
+
     # Interactive Q&A loop
     print("\n🧠 RAG is ready!")
     print("Type your question below (type 'exit' to quit)\n")
@@ -141,10 +104,16 @@ if __name__ == "__main__":
         query = input("🧑 You: ").strip()
 
         if query.lower() in {"exit", "quit", "q"}:
+            print(f"📊 Query cache: {query_cache.stats()}")
+            print(f"📊 Context packing: {context_packer.stats()}")
             print("👋 Exiting RAG. Bye!")
             break
 
         if not query:
             continue
 
-        rag_answer(index, embed_model, query, chunks, k=3)
+        first_query = startup.first_query_ms is None
+        with startup.query():
+            rag_answer(index, embed_model, query, chunks, k=3, index_version=index_version)
+        if first_query:
+            print(startup.first_query_report() + "\n")
@@ -1,72 +1,56 @@
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
+import sys
 
+from rag.answer_cache import SemanticAnswerCache, app_cache_dir, manifest_version
+from rag.corpus import DEFAULT_CORPUS_STORE_DIR, filtered_search, load_or_build_corpus
+from rag.embedders import load_backend
+from rag.ollama_client import echo_stream, get_client
+from rag.packing import ContextPacker, as_blocks
+from rag.query_cache import QueryCache
+from rag.rerank import DEFAULT_RERANK_CANDIDATES, CrossEncoderReranker
+from rag.sparse import hybrid_search, load_or_build_bm25
+from rag.warmup import StartupTimer, format_warmup, warm_up
 
-# -------------------------------------------------
-# 1) Load document
-# -------------------------------------------------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
 
+# Startup stages, time-to-ready and the first query are timed separately
+startup = StartupTimer()
 
-# -------------------------------------------------
-# 2) Chunk document
-# -------------------------------------------------
-def chunk_text(text: str, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
+# Repeated questions skip both query embedding and FAISS search
+query_cache = QueryCache(max_size=1024, ttl_seconds=3600)
 
-
-# -------------------------------------------------
-# 3) Create embeddings
-# -------------------------------------------------
-def embed_texts(model, texts):
-    embeddings = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )
-    return embeddings.astype("float32")
+# Paraphrased questions (cosine >= threshold) reuse a stored answer
+answer_cache = SemanticAnswerCache(threshold=0.92, max_size=512, cache_dir=app_cache_dir("citations"))
 
 
 # -------------------------------------------------
-# 4) Build FAISS index
+# 1) Retrieve top chunks (now returns citations too)
 # -------------------------------------------------
-def build_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]          # 384 for all-MiniLM-L6-v2
-    index = faiss.IndexFlatIP(dim)     # inner product (works like cosine if vectors are normalized)
-    index.add(embeddings)
-    return index
-
+def retrieve_top_chunks(index, model, query: str, chunks, k=3, bm25=None, reranker=None, mask=None, index_version=None):
+    # with a reranker: take the top N candidates, let the cross-encoder pick the best k
+    n = DEFAULT_RERANK_CANDIDATES if reranker is not None else k
 
-# -------------------------------------------------
-# 5) Retrieve top chunks (now returns citations too)
-# -------------------------------------------------
-def retrieve_top_chunks(index, model, query: str, chunks, k=3):
-    query_embedding = embed_texts(model, [query])     # (1, dim)
-    scores, indices = index.search(query_embedding, k)
+    # List of: (chunk_id, score, chunk_text), cached per (query, k, index)
+    if bm25 is None and mask is None:
+        results = query_cache.retrieve_top_chunks(index, model, query, chunks, k=n, index_version=index_version)
+    elif bm25 is None:
+        # filter (tags / source) is applied inside the FAISS search via an id bitmap
+        scores, ids = filtered_search(index, query_cache.embed_query(model, query), n, mask)
+        results = [(int(idx), float(score), chunks[int(idx)]) for idx, score in zip(ids[0], scores[0]) if idx != -1]
+    else:
+        # dense + BM25 keyword matches fused with RRF (score = RRF score)
+        q_emb = query_cache.embed_query(model, query)
+        results = hybrid_search(index, model, bm25, query, chunks, k=n, query_embedding=q_emb, mask=mask)
 
-    # Build list of: (chunk_id, score, chunk_text)
-    results = []
-    for answer_rank, (idx, score) in enumerate(zip(indices[0], scores[0]), start=1):
-        idx = int(idx)
-        score = float(score)
-        results.append((idx, score, chunks[idx]))
-    return results
+    if reranker is None:
+        return results
+    # falls back to the first-stage order if scoring would exceed its ms budget
+    return reranker.rerank(query, results, k=k)
 
 
 # -------------------------------------------------
-# 6) Generate answer using Ollama
+# 2) Generate answer using Ollama
 # -------------------------------------------------
 def generate_answer_with_ollama(question: str, retrieved_chunks, model_name="llama3.2:3b"):
     context = "\n\n".join([f"[Source {i+1}] {c}" for i, c in enumerate(retrieved_chunks)])
@@ -86,47 +70,92 @@ QUESTION:
 ANSWER (clear and short):
 """.strip()
 
-    result = subprocess.run(
-        ["ollama", "run", model_name, prompt],
-        capture_output=True,
-        text=True
-    )
-
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr)
-
-    return result.stdout.strip()
+    # shared pooled HTTP client: yields tokens as Ollama generates them
+    return get_client().generate_stream(prompt, model=model_name)
 
 
 # -------------------------------------------------
-# 7) RAG pipeline (prints citations at the end)
+# 3) RAG pipeline (prints citations at the end)
 # -------------------------------------------------
-def rag_answer(index, embed_model, query, chunks, k=3, ollama_model="llama3.2:3b"):
-    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k)
+def parse_filters(line: str):
+    """
+    Leading 'tag:<name>' / 'source:<path prefix>' words restrict the search:
+    'tag:api source:docs/api how do I retry?' -> ('how do I retry?', ['api'], 'docs/api')
+    """
+    tags, source_prefix = [], None
+    words = line.split()
+    while words and words[0].startswith(("tag:", "source:")):
+        key, _, value = words.pop(0).partition(":")
+        if key == "tag":
+            tags.append(value)
+        else:
+            source_prefix = value
+    return " ".join(words), tags, source_prefix
+
+
+def rag_answer(index, embed_model, query, chunks, k=3, ollama_model="llama3.2:3b", index_version="", bm25=None, reranker=None, table=None, tags=None, source_prefix=None, packer=None):
+    mask = table.mask(tags=tags, source_prefix=source_prefix) if table is not None else None
+
+    q_emb = query_cache.embed_query(embed_model, query)
+    namespace = (
+        f"{ollama_model}|k={k}|{'hybrid' if bm25 is not None else 'dense'}|{'rerank' if reranker is not None else 'first-stage'}"
+        f"|tags={sorted(tags or [])}|source={source_prefix or ''}"
+    )
+
+    cached = answer_cache.lookup(q_emb, index_version, namespace)
+    if cached is not None:
+        print(f"\n⚡ Semantic cache hit (similarity={cached['similarity']:.3f} with: {cached['question']!r})\n")
+        print("🤖 Answer:\n")
+        print(cached["answer"])
+        results = [(chunk_id, score, chunks[chunk_id]) for chunk_id, score in cached["results"]]
+        blocks = packer.pack(results, record=False) if packer is not None else as_blocks(results)
+        print_citations(blocks, table)
+        return
+
+    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k, bm25=bm25, reranker=reranker, mask=mask, index_version=index_version)
+    if not results:
+        print("\n🔎 No chunks match this filter.\n")
+        return
 
     print("\n🔎 User Question:", query)
     print("📌 Retrieved chunks:\n")
 
     retrieved_texts = []
     for rank, (chunk_id, score, chunk_text_value) in enumerate(results, start=1):
-        print(f"--- Rank {rank} | score={score:.4f} | chunk_id={chunk_id} ---")
+        where = table.citation(chunk_id) if table is not None else f"chunk_id={chunk_id}"
+        print(f"--- Rank {rank} | score={score:.4f} | {where} ---")
         print(chunk_text_value)
         print()
         retrieved_texts.append(chunk_text_value)
 
-    print("🤖 Generating answer with Ollama...\n")
-    answer = generate_answer_with_ollama(query, retrieved_texts, model_name=ollama_model)
+    print("🤖 Answer from Ollama:\n")
+    if packer is not None:
+        # overlapping / adjacent chunks of one file -> one block, duplicates dropped, within the token budget
+        blocks = packer.pack(results)
+        print(packer.report() + "\n")
+    else:
+        blocks = as_blocks(results)
+    retrieved_texts = [block["text"] for block in blocks]
 
-    print("✅ Final Answer:\n")
-    print(answer)
+    answer = echo_stream(startup.stream(generate_answer_with_ollama(query, retrieved_texts, model_name=ollama_model)))
+    answer_cache.put(query, q_emb, results, answer, index_version, namespace)
 
-    # ---- CITATIONS / SOURCES ----
+    print_citations(blocks, table)
+
+
+def print_citations(blocks, table=None):
+    """[i] matches [Source i] in the prompt: one line per packed block."""
     print("\n📚 Sources used (citations):")
-    for rank, (chunk_id, score, chunk_text_value) in enumerate(results, start=1):
-        preview = chunk_text_value.replace("\n", " ")
+    for rank, block in enumerate(blocks, start=1):
+        preview = block["text"].replace("\n", " ")
         if len(preview) > 90:
             preview = preview[:90] + "..."
-        print(f"[{rank}] chunk_id={chunk_id}, score={score:.4f} | {preview}")
+        # file:lines § section when the corpus metadata table is available
+        if table is not None:
+            where = table.block_citation(block["chunk_ids"])
+        else:
+            where = "chunk_id=" + ",".join(str(chunk_id) for chunk_id in block["chunk_ids"])
+        print(f"[{rank}] {where}, score={block['score']:.4f} | {preview}")
 
     print("\n" + "=" * 60 + "\n")
 
@@ -137,32 +166,61 @@ def rag_answer(index, embed_model, query, chunks, k=3, ollama_model="llama3.2:3b
 if __name__ == "__main__":
     print("🚀 Building RAG system...\n")
 
-    # Load + chunk
-    text = load_text_file("data.txt")
-    chunks = chunk_text(text)
-    print(f"✅ Total chunks created: {len(chunks)}")
+    # A file or a folder of .txt / .md docs:  python 08_rag_with_citations_app.py [docs_dir]
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else "data.txt"
+
+    # Embedding model + persisted FAISS index and chunk metadata (rebuilt only if a file changed)
+    with startup.stage("embed model"):
+        embed_model = load_backend()
+    with startup.stage("index"):
+        index, chunks, table = load_or_build_corpus(corpus_path, embed_model, model_name=embed_model.name)
+    index_version = manifest_version(DEFAULT_CORPUS_STORE_DIR)
+    print(f"✅ FAISS index size: {index.ntotal} | files: {len(table.sources)} | tags: {table.tags}")
+
+    # BM25 inverted index persisted next to the FAISS index (exact keyword matches)
+    with startup.stage("bm25"):
+        bm25 = load_or_build_bm25(DEFAULT_CORPUS_STORE_DIR, chunks)
+    print(f"✅ BM25 vocabulary: {len(bm25.vocab)} terms")
+
+    # Cross-encoder rerank of the top-50 (CPU), at most 200 ms per question
+    with startup.stage("reranker"):
+        reranker = CrossEncoderReranker(budget_ms=200)
 
-    # Embeddings
-    embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = embed_texts(embed_model, chunks)
-    print(f"✅ Embeddings shape: {embeddings.shape} (chunks, 384)")
+    # Prompt context: chunks merged by their byte ranges in each file, at most 1024 tokens
+    packer = ContextPacker(budget_tokens=1024, table=table)
 
-    # FAISS index
-    index = build_faiss_index(embeddings)
-    print(f"✅ FAISS index size: {index.ntotal}")
+    # Load the LLM and run both local models once now, not on the first question
+    with startup.stage("warm-up"):
+        warmup = warm_up(embed_model, "llama3.2:3b", reranker=reranker)
+    print(format_warmup(warmup, "llama3.2:3b"))
+    startup.ready()
+    print(startup.startup_report())
 
     # Interactive loop
     print("\n🧠 RAG is ready!")
-    print("Type your question below (type 'exit' to quit)\n")
+    print("Type your question below (type 'exit' to quit)")
+    print("Prefix with tag:<name> or source:<path> to search only matching docs\n")
 
     while True:
         query = input("🧑 You: ").strip()
 
         if query.lower() in {"exit", "quit", "q"}:
+            print(f"📊 Query cache: {query_cache.stats()}")
+            print(f"📊 Answer cache: {answer_cache.stats()}")
+            print(f"📊 Reranker: {reranker.stats()}")
+            print(f"📊 Context packing: {packer.stats()}")
             print("👋 Exiting RAG. Bye!")
             break
 
+        query, tags, source_prefix = parse_filters(query)
         if not query:
             continue
 
-        rag_answer(index, embed_model, query, chunks, k=3, ollama_model="llama3.2:3b")
+        first_query = startup.first_query_ms is None
+        with startup.query():
+            rag_answer(
+                index, embed_model, query, chunks, k=3, ollama_model="llama3.2:3b", index_version=index_version,
+                bm25=bm25, reranker=reranker, table=table, tags=tags, source_prefix=source_prefix, packer=packer,
+            )
+        if first_query:
+            print(startup.first_query_report() + "\n")
@@ -1,70 +1,56 @@
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
+import sys
 
-
-# -------------------------
-# Load + Chunk
-# -------------------------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
+from rag.answer_cache import manifest_version
+from rag.conversation import ContextConversation
+from rag.embedders import load_backend
+from rag.index_store import load_or_build_index
+from rag.ollama_client import echo_stream, get_client
+from rag.packing import ContextPacker, approx_tokens
+from rag.query_cache import QueryCache
+from rag.warmup import StartupTimer, format_warmup, warm_up
 
 
-def chunk_text(text: str, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
+# Startup stages, time-to-ready and the first query are timed separately
+startup = StartupTimer()
 
+# Repeated questions skip both query embedding and FAISS search
+query_cache = QueryCache(max_size=1024, ttl_seconds=3600)
 
-# -------------------------
-# Embeddings
-# -------------------------
-def embed_texts(model, texts):
-    embeddings = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )
-    return embeddings.astype("float32")
+# Overlapping / adjacent hits are merged, duplicates dropped, at most 1024 prompt tokens
+context_packer = ContextPacker(budget_tokens=1024)
 
+# Context window requested from Ollama and the answer length cap. The carried
+# conversation is reset when it + the next prompt would leave less than
+# NUM_PREDICT tokens for the answer
+NUM_CTX = 4096
+NUM_PREDICT = 512
+# approx_tokens is a ~4 chars/token estimate, plus per-turn chat-template tokens
+PROMPT_MARGIN_TOKENS = 128
 
-# -------------------------
-# FAISS index
-# -------------------------
-def build_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-    return index
+# Conversational mode: evaluated once per context, then reused from the KV cache
+SYSTEM_PROMPT = """
+You are a helpful assistant.
+Answer each question using ONLY the CONTEXT given with it.
+Also use the earlier conversation to understand pronouns like "it", "that", etc.
+If the answer is not in the context, say:
+"I don't know based on the provided documents."
+""".strip()
 
 
 # -------------------------
 # Retrieve top chunks
 # -------------------------
-def retrieve_top_chunks(index, model, query: str, chunks, k=3):
-    query_embedding = embed_texts(model, [query])
-    scores, indices = index.search(query_embedding, k)
-
-    results = []
-    for idx, score in zip(indices[0], scores[0]):
-        idx = int(idx)
-        score = float(score)
-        results.append((idx, score, chunks[idx]))
-    return results
+def retrieve_top_chunks(index, model, query: str, chunks, k=3, index_version=None):
+    return query_cache.retrieve_top_chunks(index, model, query, chunks, k=k, index_version=index_version)
 
 
 # -------------------------
 # Generate with Ollama (now includes chat history)
 # -------------------------
-def generate_answer_with_ollama(question: str, retrieved_chunks, chat_history, model_name="llama3.2:3b"):
+def generate_answer_with_ollama(question: str, retrieved_chunks, chat_history, model_name="llama3.2:3b", final=None):
     context = "\n\n".join([f"[Source {i+1}] {c}" for i, c in enumerate(retrieved_chunks)])
 
     # keep history short so prompts don’t get too long
@@ -89,51 +75,81 @@ QUESTION:
 ANSWER (clear and short):
 """.strip()
 
-    result = subprocess.run(
-        ["ollama", "run", model_name, prompt],
-        capture_output=True,
-        text=True
-    )
+    # shared pooled HTTP client: yields tokens as Ollama generates them
+    return get_client().generate_stream(prompt, model=model_name, final=final)
+
+
+# -------------------------
+# Conversational mode: only the new turn is evaluated
+# -------------------------
+def generate_turn_with_context(question: str, retrieved_chunks, chat_history, conversation):
+    context = "\n\n".join([f"[Source {i+1}] {c}" for i, c in enumerate(retrieved_chunks)])
+
+    prompt = f"""
+CONTEXT:
+{context}
 
-    if result.returncode != 0:
-        raise RuntimeError(result.stderr)
+QUESTION:
+{question}
+
+ANSWER (clear and short):
+""".strip()
 
-    return result.stdout.strip()
+    # reset if carried context + this prompt + the answer would not fit in NUM_CTX;
+    # a fresh context (first turn / after a reset) gets the recent turns as text once
+    if conversation.start_turn(approx_tokens(prompt)) and chat_history:
+        history_text = "\n".join([f"User: {q}\nAssistant: {a}" for (q, a) in chat_history])
+        prompt = f"CHAT HISTORY:\n{history_text}\n\n{prompt}"
+
+    return conversation.stream(prompt)
 
 
 # -------------------------
 # RAG answer (with citations + memory)
 # -------------------------
-def rag_answer(index, embed_model, query, chunks, chat_history, k=3, ollama_model="llama3.2:3b"):
-    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k)
+def rag_answer(index, embed_model, query, chunks, chat_history, k=3, ollama_model="llama3.2:3b", conversation=None, index_version=None):
+    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k, index_version=index_version)
 
     print("\n🔎 User Question:", query)
     print("📌 Retrieved chunks:\n")
 
-    retrieved_texts = []
     for rank, (chunk_id, score, chunk_text_value) in enumerate(results, start=1):
         print(f"--- Rank {rank} | score={score:.4f} | chunk_id={chunk_id} ---")
         print(chunk_text_value)
         print()
-        retrieved_texts.append(chunk_text_value)
-
-    print("🤖 Generating answer with Ollama...\n")
-    answer = generate_answer_with_ollama(
-        question=query,
-        retrieved_chunks=retrieved_texts,
-        chat_history=chat_history,
-        model_name=ollama_model
-    )
-
-    print("✅ Final Answer:\n")
-    print(answer)
 
+    blocks = context_packer.pack(results)
+    retrieved_texts = [block["text"] for block in blocks]
+    print(context_packer.report() + "\n")
+
+    print("🤖 Answer from Ollama:\n")
+    if conversation is not None:
+        answer = echo_stream(startup.stream(generate_turn_with_context(query, retrieved_texts, chat_history, conversation)))
+        turn = conversation.last_turn()
+    else:
+        final = {}
+        answer = echo_stream(startup.stream(generate_answer_with_ollama(
+            question=query,
+            retrieved_chunks=retrieved_texts,
+            chat_history=chat_history,
+            model_name=ollama_model,
+            final=final,
+        )))
+        turn = {"prompt_eval_count": final.get("prompt_eval_count", 0), "prompt_eval_ms": final.get("prompt_eval_duration", 0) / 1e6}
+
+    # tokens the model actually had to read for this turn (cached prefix not counted)
+    carried = f" | carried context: {turn['context_tokens']} tokens" if "context_tokens" in turn else ""
+    fresh = " (fresh context)" if turn.get("fresh_context") else ""
+    print(f"\n🧮 Prompt eval: {turn['prompt_eval_count']} tokens in {turn['prompt_eval_ms']:.0f} ms{fresh}{carried}")
+
+    # numbered like [Source i] in the prompt: one line per packed block
     print("\n📚 Sources used (citations):")
-    for rank, (chunk_id, score, chunk_text_value) in enumerate(results, start=1):
-        preview = chunk_text_value.replace("\n", " ")
+    for rank, block in enumerate(blocks, start=1):
+        preview = block["text"].replace("\n", " ")
         if len(preview) > 90:
             preview = preview[:90] + "..."
-        print(f"[{rank}] chunk_id={chunk_id}, score={score:.4f} | {preview}")
+        chunk_ids = ",".join(str(chunk_id) for chunk_id in block["chunk_ids"])
+        print(f"[{rank}] chunk_id={chunk_ids}, score={block['score']:.4f} | {preview}")
 
     print("\n" + "=" * 60 + "\n")
 
@@ -144,37 +160,65 @@ def rag_answer(index, embed_model, query, chunks, chat_history, k=3, ollama_mode
 # MAIN: interactive loop with memory
 # -------------------------
 if __name__ == "__main__":
-    print("🚀 Building RAG system...\n")
+    # context (default): reuse Ollama's context tokens across turns
+    # history: re-send the chat history as text in every prompt (for comparison)
+    mode = sys.argv[1] if len(sys.argv) > 1 else "context"
+    if mode not in ("context", "history"):
+        raise SystemExit(f"Unknown mode {mode!r}, expected 'context' or 'history'")
 
-    text = load_text_file("data.txt")
-    chunks = chunk_text(text)
-    print(f"✅ Total chunks created: {len(chunks)}")
+    # first call configures the shared client: same num_ctx for warm-up and every turn (no reload)
+    get_client(options={"num_ctx": NUM_CTX, "num_predict": NUM_PREDICT})
 
-    embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = embed_texts(embed_model, chunks)
-    print(f"✅ Embeddings shape: {embeddings.shape} (chunks, 384)")
+    print("🚀 Building RAG system...\n")
 
-    index = build_faiss_index(embeddings)
+    with startup.stage("embed model"):
+        embed_model = load_backend()
+    with startup.stage("index"):
+        index, chunks = load_or_build_index("data.txt", embed_model, model_name=embed_model.name)
+    # manifest hash: changes whenever the index is rebuilt, keys the query cache
+    index_version = manifest_version()
     print(f"✅ FAISS index size: {index.ntotal}")
 
+    # Load the LLM and run the embedding model once now, not on the first question
+    with startup.stage("warm-up"):
+        warmup = warm_up(embed_model, "llama3.2:3b")
+    print(format_warmup(warmup, "llama3.2:3b"))
+    startup.ready()
+    print(startup.startup_report())
+
     # Store memory as (question, answer) pairs
     chat_history = []
     MAX_TURNS = 4  # keeps last 4 Q&A pairs
 
-    print("\n🧠 RAG with Memory is ready!")
+    conversation = None
+    if mode == "context":
+        conversation = ContextConversation(SYSTEM_PROMPT, model="llama3.2:3b", max_context_tokens=NUM_CTX - NUM_PREDICT - PROMPT_MARGIN_TOKENS)
+
+    print(f"\n🧠 RAG with Memory is ready! (mode: {mode})")
     print("Type your question below (type 'exit' to quit)\n")
 
     while True:
         query = input("🧑 You: ").strip()
 
         if query.lower() in {"exit", "quit", "q"}:
+            print(f"📊 Query cache: {query_cache.stats()}")
+            print(f"📊 Context packing: {context_packer.stats()}")
+            if conversation is not None:
+                print(f"📊 Conversation: {conversation.stats()}")
             print("👋 Exiting. Bye!")
             break
 
         if not query:
             continue
 
-        answer = rag_answer(index, embed_model, query, chunks, chat_history, k=3, ollama_model="llama3.2:3b")
+        first_query = startup.first_query_ms is None
+        with startup.query():
+            answer = rag_answer(
+                index, embed_model, query, chunks, chat_history, k=3, ollama_model="llama3.2:3b", conversation=conversation,
+                index_version=index_version,
+            )
+        if first_query:
+            print(startup.first_query_report() + "\n")
 
         # update memory
         chat_history.append((query, answer))
@@ -2,53 +2,32 @@ import streamlit as st
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
+from rag.answer_cache import SemanticAnswerCache, app_cache_dir, manifest_version
+from rag.embedders import load_backend
+from rag.index_store import default_store_dir, load_or_build_index
+from rag.ollama_client import OllamaError, get_client
+from rag.query_cache import QueryCache
+from rag.warmup import StartupTimer, format_warmup, warm_up
 
 
 # ---------- RAG helper functions ----------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
-
-
-def chunk_text(text, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
-
-
-def embed_texts(model, texts):
-    return model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    ).astype("float32")
-
+@st.cache_resource
+def get_query_cache():
+    # shared across reruns and sessions: repeated questions skip embedding + search
+    return QueryCache(max_size=1024, ttl_seconds=3600)
 
-def build_faiss_index(embeddings):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-    return index
 
+@st.cache_resource
+def get_answer_cache():
+    # paraphrased questions (cosine >= threshold) reuse a stored answer
+    return SemanticAnswerCache(threshold=0.92, max_size=512, cache_dir=app_cache_dir("streamlit_rag"))
 
-def retrieve_top_chunks(index, model, query, chunks, k=3):
-    q_emb = embed_texts(model, [query])
-    scores, ids = index.search(q_emb, k)
 
-    results = []
-    for idx, score in zip(ids[0], scores[0]):
-        results.append((int(idx), float(score), chunks[int(idx)]))
-    return results
+def retrieve_top_chunks(index, model, query, chunks, k=3, index_version=None):
+    return get_query_cache().retrieve_top_chunks(index, model, query, chunks, k=k, index_version=index_version)
 
 
-def generate_with_ollama(question, retrieved_chunks, model_name="llama3.2:3b"):
+def generate_with_ollama(question, retrieved_chunks, model_name="llama3.2:3b", errors: list = None):
     context = "\n\n".join(retrieved_chunks)
 
     prompt = f"""
@@ -64,13 +43,14 @@ QUESTION:
 ANSWER:
 """.strip()
 
-    result = subprocess.run(
-        ["ollama", "run", model_name, prompt],
-        capture_output=True,
-        text=True
-    )
-
-    return result.stdout.strip()
+    # shared pooled HTTP client: yields tokens for st.write_stream; a failure,
+    # even after some tokens, is appended to `errors` so the answer isn't cached
+    try:
+        yield from startup.stream(get_client().generate_stream(prompt, model=model_name))
+    except OllamaError as e:
+        if errors is not None:
+            errors.append(e)
+        yield f"\n\nOllama error:\n{e}"
 
 
 # ---------- Streamlit UI ----------
@@ -78,28 +58,65 @@ st.set_page_config(page_title="RAG Chatbot", layout="centered")
 st.title("🧠 RAG Chatbot (FAISS + Ollama)")
 
 @st.cache_resource
-def setup_rag():
-    text = load_text_file("data.txt")
-    chunks = chunk_text(text)
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = embed_texts(model, chunks)
-    index = build_faiss_index(embeddings)
-    return model, index, chunks
+def get_startup_timer():
+    # one per server process: startup and the first query are timed once
+    return StartupTimer()
 
-model, index, chunks = setup_rag()
+startup = get_startup_timer()
+
+@st.cache_resource
+def setup_rag():
+    with startup.stage("embed model"):
+        model = load_backend()
+    with startup.stage("index"):
+        index, chunks = load_or_build_index("data.txt", model, model_name=model.name, storage="mmap")
+    # load the LLM and run the embedding model once now, not on the first question
+    with startup.stage("warm-up"):
+        warmup = warm_up(model, "llama3.2:3b")
+    startup.ready()
+    return model, index, chunks, manifest_version(default_store_dir("mmap")), warmup
+
+model, index, chunks, index_version, warmup = setup_rag()
 
 query = st.text_input("Ask a question:")
 
 if query:
-    results = retrieve_top_chunks(index, model, query, chunks)
-
-    with st.spinner("Thinking..."):
-        answer = generate_with_ollama(query, [r[2] for r in results])
-
-    st.subheader("🤖 Answer")
-    st.write(answer)
+    with startup.query():
+        answer_cache = get_answer_cache()
+        q_emb = get_query_cache().embed_query(model, query)
+        cached = answer_cache.lookup(q_emb, index_version, namespace="llama3.2:3b|k=3")
+
+        st.subheader("🤖 Answer")
+        if cached is not None:
+            results = [(idx, score, chunks[idx]) for idx, score in cached["results"]]
+            st.write(cached["answer"])
+            st.caption(f"⚡ From semantic cache (similarity={cached['similarity']:.2f} with: “{cached['question']}”)")
+        else:
+            results = retrieve_top_chunks(index, model, query, chunks, index_version=index_version)
+            # tokens render as they arrive; sources below appear once the answer is done
+            errors = []
+            answer = st.write_stream(generate_with_ollama(query, [r[2] for r in results], errors=errors))
+            if answer and not errors:
+                answer_cache.put(query, q_emb, results, answer, index_version, namespace="llama3.2:3b|k=3")
 
     st.subheader("📚 Sources")
     for i, (idx, score, chunk) in enumerate(results, start=1):
         st.markdown(f"**Source {i} (score={score:.2f})**")
         st.write(chunk)
+
+    stats = get_query_cache().stats()
+    st.caption(
+        f"Query cache — embeddings: {stats['embeddings']['hits']} hits / {stats['embeddings']['misses']} misses • "
+        f"results: {stats['results']['hits']} hits / {stats['results']['misses']} misses"
+    )
+    answer_stats = get_answer_cache().stats()
+    st.caption(
+        f"Answer cache — {answer_stats['hits']} hits / {answer_stats['misses']} misses "
+        f"(hit rate {answer_stats['hit_rate']:.0%})"
+    )
+
+# ---------- Cold-start timings ----------
+st.sidebar.caption(startup.startup_report())
+st.sidebar.caption(format_warmup(warmup, "llama3.2:3b"))
+if startup.first_query_ms is not None:
+    st.sidebar.caption(startup.first_query_report())
@@ -2,61 +2,40 @@ import streamlit as st
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
-import numpy as np
-import faiss
-import subprocess
+from rag.answer_cache import SemanticAnswerCache, app_cache_dir, manifest_version
+from rag.embedders import load_backend
+from rag.index_store import default_store_dir, load_or_build_index
+from rag.ollama_client import OllamaError, get_client
+from rag.query_cache import QueryCache
+from rag.warmup import StartupTimer, format_warmup, warm_up
 
 
 # ---------- RAG helper functions ----------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
-
-
-def chunk_text(text, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
-
-
-def embed_texts(model, texts):
-    return model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    ).astype("float32")
+@st.cache_resource
+def get_query_cache():
+    # shared across reruns and sessions: repeated questions skip embedding + search
+    return QueryCache(max_size=1024, ttl_seconds=3600)
 
 
-def build_faiss_index(embeddings):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)
-    index.add(embeddings)
-    return index
+@st.cache_resource
+def get_answer_cache():
+    # paraphrased questions (cosine >= threshold) reuse a stored answer
+    return SemanticAnswerCache(threshold=0.92, max_size=512, cache_dir=app_cache_dir("streamlit_rag_chat"))
 
 
-def retrieve_top_chunks(index, model, query, chunks, k=3):
-    q_emb = embed_texts(model, [query])
-    scores, ids = index.search(q_emb, k)
+def retrieve_top_chunks(index, model, query, chunks, k=3, mmr_lambda=None, index_version=None):
+    return get_query_cache().retrieve_top_chunks(index, model, query, chunks, k=k, index_version=index_version, mmr_lambda=mmr_lambda)
 
-    results = []
-    for idx, score in zip(ids[0], scores[0]):
-        results.append((int(idx), float(score), chunks[int(idx)]))
-    return results
 
-
-def run_ollama(prompt: str, model_name="llama3.2:3b") -> str:
-    result = subprocess.run(
-        ["ollama", "run", model_name, prompt],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        return f"Ollama error:\n{result.stderr}"
-    return result.stdout.strip()
+def run_ollama(prompt: str, model_name="llama3.2:3b", errors: list = None):
+    # yields tokens as they arrive (for st.write_stream); a failure, even
+    # after some tokens, is appended to `errors` so the answer isn't cached
+    try:
+        yield from startup.stream(get_client().generate_stream(prompt, model=model_name))
+    except OllamaError as e:
+        if errors is not None:
+            errors.append(e)
+        yield f"\n\nOllama error:\n{e}"
 
 
 # ---------- Decision: use RAG or General ----------
@@ -71,7 +50,7 @@ def should_use_rag(results, min_score=0.20) -> bool:
     return best_score >= min_score
 
 
-def generate_answer_hybrid(query, rag_chunks, use_rag, ollama_model="llama3.2:3b"):
+def generate_answer_hybrid(query, rag_chunks, use_rag, ollama_model="llama3.2:3b", errors: list = None):
     if use_rag:
         context = "\n\n".join([f"- {c}" for c in rag_chunks])
         prompt = f"""
@@ -95,7 +74,7 @@ USER QUESTION:
 
 FINAL ANSWER:
 """.strip()
-        return run_ollama(prompt, model_name=ollama_model)
+        return run_ollama(prompt, model_name=ollama_model, errors=errors)
 
     # General chat only
     prompt = f"""
@@ -107,7 +86,7 @@ USER QUESTION:
 
 ANSWER:
 """.strip()
-    return run_ollama(prompt, model_name=ollama_model)
+    return run_ollama(prompt, model_name=ollama_model, errors=errors)
 
 
 # ---------- Streamlit UI ----------
@@ -117,32 +96,58 @@ st.title("🧠 Hybrid Chatbot (RAG + General Knowledge) — FAISS + Ollama")
 st.caption("✅ Uses your data.txt when relevant • ✅ Otherwise answers from general knowledge • ✅ Shows sources when RAG is used")
 
 @st.cache_resource
-def setup_rag():
-    text = load_text_file("data.txt")
-    chunks = chunk_text(text)
-    embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = embed_texts(embed_model, chunks)
-    index = build_faiss_index(embeddings)
-    return embed_model, index, chunks
+def get_startup_timer():
+    # one per server process: startup and the first query are timed once
+    return StartupTimer()
 
-embed_model, index, chunks = setup_rag()
+startup = get_startup_timer()
+
+@st.cache_resource
+def setup_rag():
+    with startup.stage("embed model"):
+        embed_model = load_backend()
+    with startup.stage("index"):
+        index, chunks = load_or_build_index("data.txt", embed_model, model_name=embed_model.name, storage="mmap")
+    # load the default LLM and run the embedding model once now, not on the first question
+    with startup.stage("warm-up"):
+        warmup = warm_up(embed_model, "llama3.2:3b")
+    startup.ready()
+    return embed_model, index, chunks, manifest_version(default_store_dir("mmap")), warmup
+
+embed_model, index, chunks, index_version, warmup = setup_rag()
 
 ollama_model = st.selectbox("Choose Ollama model", ["llama3.2:3b", "llama3.1:8b", "mistral", "phi3"], index=0)
 k = st.slider("How many sources (top-k)?", min_value=1, max_value=5, value=3)
+# MMR: 1.0 = plain top-k, lower values trade relevance for less repetitive sources
+diversity = st.slider("Relevance vs diversity (MMR λ)", min_value=0.0, max_value=1.0, value=1.0, step=0.1)
+mmr_lambda = None if diversity >= 1.0 else diversity
 
 query = st.text_input("Ask a question:")
 
 if query:
-    results = retrieve_top_chunks(index, embed_model, query, chunks, k=k)
-    rag_chunks = [r[2] for r in results]
-
-    use_rag = should_use_rag(results, min_score=0.20)
-
-    with st.spinner("Thinking..."):
-        answer = generate_answer_hybrid(query, rag_chunks, use_rag, ollama_model=ollama_model)
-
-    st.subheader("🤖 Answer")
-    st.write(answer)
+    with startup.query():
+        answer_cache = get_answer_cache()
+        q_emb = get_query_cache().embed_query(embed_model, query)
+        namespace = f"{ollama_model}|k={k}|mmr={mmr_lambda}"
+        cached = answer_cache.lookup(q_emb, index_version, namespace)
+
+        st.subheader("🤖 Answer")
+        if cached is not None:
+            results = [(idx, score, chunks[idx]) for idx, score in cached["results"]]
+            use_rag = should_use_rag(results, min_score=0.20)
+            st.write(cached["answer"])
+            st.caption(f"⚡ From semantic cache (similarity={cached['similarity']:.2f} with: “{cached['question']}”)")
+        else:
+            results = retrieve_top_chunks(index, embed_model, query, chunks, k=k, mmr_lambda=mmr_lambda, index_version=index_version)
+            rag_chunks = [r[2] for r in results]
+
+            use_rag = should_use_rag(results, min_score=0.20)
+
+            # tokens render as they arrive; sources below appear once the answer is done
+            errors = []
+            answer = st.write_stream(generate_answer_hybrid(query, rag_chunks, use_rag, ollama_model=ollama_model, errors=errors))
+            if answer and not errors:
+                answer_cache.put(query, q_emb, results, answer, index_version, namespace)
 
     if use_rag:
         st.subheader("📚 Sources (from your data.txt)")
@@ -151,3 +156,20 @@ if query:
             st.write(chunk)
     else:
         st.info("No strong match found in your document, so I answered using general knowledge.")
+
+    stats = get_query_cache().stats()
+    st.caption(
+        f"Query cache — embeddings: {stats['embeddings']['hits']} hits / {stats['embeddings']['misses']} misses • "
+        f"results: {stats['results']['hits']} hits / {stats['results']['misses']} misses"
+    )
+    answer_stats = get_answer_cache().stats()
+    st.caption(
+        f"Answer cache — {answer_stats['hits']} hits / {answer_stats['misses']} misses "
+        f"(hit rate {answer_stats['hit_rate']:.0%})"
+    )
+
+# ---------- Cold-start timings ----------
+st.sidebar.caption(startup.startup_report())
+st.sidebar.caption(format_warmup(warmup, "llama3.2:3b"))
+if startup.first_query_ms is not None:
+    st.sidebar.caption(startup.first_query_report())
@@ -2,48 +2,23 @@ import json
 import os
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import numpy as np
-import faiss
 
-
-# ----------------------------
-# Core RAG components (reuse)
-# ----------------------------
-def load_text_file(file_path: str) -> str:
-    return Path(file_path).read_text(encoding="utf-8")
-
-
-def chunk_text(text: str, chunk_size=200, chunk_overlap=40):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
-    )
-    return splitter.split_text(text)
-
-
-def embed_texts(model, texts):
-    embeddings = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    )
-    return embeddings.astype("float32")
-
-
-def build_faiss_index(embeddings: np.ndarray):
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatIP(dim)  # inner product works with normalized embeddings
-    index.add(embeddings)
-    return index
-
-
-def retrieve_top_chunks(index, model, query: str, chunks, k=3):
-    query_embedding = embed_texts(model, [query])
-    scores, indices = index.search(query_embedding, k)
-    return [chunks[idx] for idx in indices[0]]
+from rag.ann import recall_at_k
+from rag.core import build_faiss_index, chunk_text, embed_texts, load_text_file, retrieve_batch
+from rag.embed_cache import CachedEmbedder, EmbeddingCache
+from rag.embedders import load_backend
+from rag.evaluation import evaluate_retrieval, score_rankings, time_retrieval
+from rag.index_store import file_sha256
+from rag.mmr import mmr_search
+from rag.quantized import STORAGE_MODES, build_quantized_index
+from rag.rerank import DEFAULT_RERANK_CANDIDATES, CrossEncoderReranker
+from rag.sparse import BM25Index, hybrid_retrieve_batch
 
 
 # ----------------------------
@@ -59,39 +34,192 @@ def load_eval_set(path: str):
     return items
 
 
-def precision_at_k(eval_items, index, embed_model, chunks, k: int):
-    hits = 0
-    missed = []
+def result_ids(results):
+    """[(chunk_id, score, text), ...] per query -> [chunk_id, ...] per query."""
+    return [[chunk_id for chunk_id, _, _ in row] for row in results]
+
+
+# MMR diversity settings evaluated next to plain dense retrieval (1.0 would equal dense)
+MMR_LAMBDAS = (0.5, 0.7)
+
+
+def make_retrievers(index, query_model, bm25, chunks) -> dict:
+    """
+    name -> retrieve(questions, k) -> ranked ids per question. Every method
+    is one batched call (one encode + one search for all questions); a
+    single-query call is the same function with one question.
+    """
+    def dense(questions, k):
+        return result_ids(retrieve_batch(index, query_model, questions, chunks, k=k))
+
+    def hybrid(questions, k):
+        return result_ids(hybrid_retrieve_batch(index, query_model, bm25, questions, chunks, k=k))
+
+    def mmr(lambda_mult):
+        def retrieve(questions, k):
+            return result_ids(retrieve_batch(index, query_model, questions, chunks, k=k, mmr_lambda=lambda_mult))
+        return retrieve
+
+    retrievers = {"dense": dense, "hybrid": hybrid}
+    retrievers.update({f"mmr@{lam}": mmr(lam) for lam in MMR_LAMBDAS})
+    return retrievers
 
-    for item in eval_items:
-        q = item["question"]
-        gold_phrase = item["gold_contains"].lower()
 
-        retrieved = retrieve_top_chunks(index, embed_model, q, chunks, k=k)
-        retrieved_lc = [r.lower() for r in retrieved]
+def evaluate_config(text, eval_items, embed_model, query_model, chunk_size, chunk_overlap, ks):
+    """
+    Chunk + embed (through the embedding cache) + index one config, then
+    score every retriever from one batched retrieval at max(ks). Latency is
+    added later by add_latency, outside the worker threads.
+    """
+    chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    embeddings = embed_texts(embed_model, chunks)
+    index = build_faiss_index(embeddings)
+    bm25 = BM25Index.build(chunks)
+    retrievers = make_retrievers(index, query_model, bm25, chunks)
 
-        hit = any(gold_phrase in r for r in retrieved_lc)
-        hits += 1 if hit else 0
+    report = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "num_chunks": len(chunks),
+        "methods": {name: evaluate_retrieval(eval_items, retrieve, chunks, ks) for name, retrieve in retrievers.items()},
+    }
+    return report, (chunks, embeddings, index, retrievers)
 
-        if not hit:
-            missed.append(item["id"])
 
-        print(f"[{item['id']}] hit={hit} | k={k} | question={q}")
+def add_latency(report, retrievers, eval_items, k: int):
+    """Serial single-query latency (real encode + search) for every method of one config."""
+    for name, retrieve in retrievers.items():
+        report["methods"][name]["latency_ms"] = time_retrieval(
+            eval_items, lambda question, k, retrieve=retrieve: retrieve([question], k)[0], k
+        )
 
-    precision = hits / max(len(eval_items), 1)
-    return precision, hits, missed
+
+def compare_rerank(eval_items, index, query_model, chunks, reranker, ks, candidates: int = DEFAULT_RERANK_CANDIDATES) -> dict:
+    """hit@k etc. of the dense top-k vs the cross-encoder reranked top-`candidates`."""
+    questions = [item["question"] for item in eval_items]
+    dense = retrieve_batch(index, query_model, questions, chunks, k=candidates)
+    reranked = [reranker.rerank(question, results, k=max(ks)) for question, results in zip(questions, dense)]
+
+    result = {
+        "candidates": candidates,
+        "dense": score_rankings(eval_items, [ids[:max(ks)] for ids in result_ids(dense)], chunks, ks)["metrics"],
+        "reranked": score_rankings(eval_items, result_ids(reranked), chunks, ks)["metrics"],
+        "reranker": reranker.stats(),
+    }
+    for k in ks:
+        print(f"hit@{k}: dense {result['dense'][f'hit@{k}']:.2f} | reranked top-{candidates} {result['reranked'][f'hit@{k}']:.2f}")
+    print(f"reranker: {result['reranker']}")
+    return result
+
+
+def compare_storage_modes(eval_items, embeddings, query_embeddings, chunks, ks) -> dict:
+    """
+    Memory per vector, recall loss vs the float32 top-k and hit@k of each
+    compressed storage mode. One search per k: binary's rerank depth
+    depends on k, so a smaller k is not a prefix of a larger one.
+    """
+    exact = build_faiss_index(embeddings)
+
+    result = {}
+    for mode in STORAGE_MODES:
+        index = build_quantized_index(embeddings, mode)
+        result[mode] = {
+            "bytes_per_vector": index.bytes_per_vector,
+            "rerank_bytes_per_vector": getattr(index, "rerank_bytes_per_vector", 0),
+        }
+        memory = f"{index.bytes_per_vector} B/vector"
+        if mode == "binary":
+            memory += f" (+{index.rerank_bytes_per_vector} B rerank store)"
+
+        for k in ks:
+            _, exact_ids = exact.search(query_embeddings, k)
+            _, ids = index.search(query_embeddings, k)
+            recall = recall_at_k(ids, exact_ids)
+            hit = score_rankings(eval_items, ids, chunks, (k,))["metrics"][f"hit@{k}"]
+            result[mode][f"recall_vs_float32@{k}"] = recall
+            result[mode][f"hit@{k}"] = hit
+            print(
+                f"{mode:>8} | {memory:<38} | recall@{k} vs float32: {recall:.3f} "
+                f"(loss {1 - recall:.3f}) | hit@{k}: {hit:.2f}"
+            )
+    return result
+
+
+def redundancy(ids, embeddings: np.ndarray) -> float:
+    """Mean pairwise cosine among the retrieved chunks (lower = more diverse context)."""
+    ids = [idx for idx in ids if idx != -1]
+    if len(ids) < 2:
+        return 0.0
+    vectors = embeddings[ids]
+    similarity = vectors @ vectors.T
+    return float((similarity.sum() - np.trace(similarity)) / (len(ids) * (len(ids) - 1)))
+
+
+def compare_mmr(eval_items, index, embeddings, query_embeddings, chunks, k: int = 3, baseline_k: int = 5) -> dict:
+    """
+    Does MMR at k match dense at a larger baseline_k? hit@k + mean
+    redundancy of the k retrieved chunks, dense vs each MMR lambda.
+    """
+    _, dense_ids = index.search(query_embeddings, baseline_k)
+    dense = score_rankings(eval_items, dense_ids, chunks, (k, baseline_k))["metrics"]
+    result = {
+        "dense": {
+            f"hit@{k}": dense[f"hit@{k}"],
+            f"hit@{baseline_k}": dense[f"hit@{baseline_k}"],
+            f"redundancy@{k}": float(np.mean([redundancy(row[:k], embeddings) for row in dense_ids])),
+        },
+    }
+    print(
+        f"{'dense':>7} | hit@{k} {dense[f'hit@{k}']:.2f} | hit@{baseline_k} {dense[f'hit@{baseline_k}']:.2f} "
+        f"| redundancy@{k} {result['dense'][f'redundancy@{k}']:.3f}"
+    )
+    for lam in MMR_LAMBDAS:
+        _, mmr_ids = mmr_search(index, query_embeddings, k, lambda_mult=lam)
+        hit = score_rankings(eval_items, mmr_ids, chunks, (k,))["metrics"][f"hit@{k}"]
+        mmr_redundancy = float(np.mean([redundancy(row, embeddings) for row in mmr_ids]))
+        result[f"mmr@{lam}"] = {f"hit@{k}": hit, f"redundancy@{k}": mmr_redundancy}
+        print(f"{f'mmr@{lam}':>7} | hit@{k} {hit:.2f} | redundancy@{k} {mmr_redundancy:.3f}")
+    return result
+
+
+def print_config_report(report, ks):
+    print(f"Chunks: {report['num_chunks']}")
+    names = [f"hit@{k}" for k in ks] + [f"recall@{k}" for k in ks] + [f"ndcg@{k}" for k in ks] + ["mrr"]
+    print(f"{'':>7} | " + " | ".join(f"{name:>9}" for name in names) + " | p50 / p95 / p99 ms")
+    for mode, result in report["methods"].items():
+        latency = result["latency_ms"]
+        print(
+            f"{mode:>7} | " + " | ".join(f"{result['metrics'][name]:>9.3f}" for name in names)
+            + f" | {latency['p50']:.2f} / {latency['p95']:.2f} / {latency['p99']:.2f}"
+        )
+    dense = report["methods"]["dense"]
+    print(f"dense missed: {dense['missed']} | unanswerable: {dense['unanswerable']}")
 
 
 # ----------------------------
 # Main
+#
+#   python 12_eval_retrieval_precision.py [report.json] [workers]
 # ----------------------------
 if __name__ == "__main__":
+    report_path = sys.argv[1] if len(sys.argv) > 1 else "eval_report.json"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    ks = [1, 3, 5]
+
     # Load corpus
     text = load_text_file("data.txt")
 
     # Load eval set
     eval_items = load_eval_set("eval_set.jsonl")
 
+    # Models are loaded once and shared by every config
+    query_model = load_backend()
+    # chunks embedded in earlier runs or configs come from the on-disk cache
+    embed_model = CachedEmbedder(query_model, EmbeddingCache(), model_name=query_model.name)
+
+    # Cross-encoder for the rerank comparison (loaded once, generous budget for eval)
+    reranker = CrossEncoderReranker(budget_ms=1000)
+
     # Test multiple chunking configurations
     configs = [
         (150, 20),
@@ -99,19 +227,44 @@ if __name__ == "__main__":
         (300, 60),
     ]
 
-    for chunk_size, chunk_overlap in configs:
+    # quality: configs may run in parallel threads (encode / FAISS release the GIL)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outputs = list(pool.map(
+            lambda config: evaluate_config(text, eval_items, embed_model, query_model, *config, ks),
+            configs,
+        ))
+    print(f"⏱️ Evaluated {len(configs)} configs in {time.perf_counter() - start:.2f}s ({workers} workers)")
+
+    # latency: one config and one question at a time, after the pool is done
+    for report, (_, _, _, retrievers) in outputs:
+        add_latency(report, retrievers, eval_items, max(ks))
+
+    question_embeddings = embed_texts(query_model, [item["question"] for item in eval_items])
+    for report, (chunks, embeddings, index, _) in outputs:
         print("\n" + "=" * 70)
-        print(f"=== Config: chunk_size={chunk_size}, overlap={chunk_overlap} ===")
+        print(f"=== Config: chunk_size={report['chunk_size']}, overlap={report['chunk_overlap']} ===")
+        print_config_report(report, ks)
+        print()
+
+        print("--- MMR diversity vs dense ---")
+        report["mmr_vs_dense"] = compare_mmr(eval_items, index, embeddings, question_embeddings, chunks, k=3, baseline_k=5)
+        print()
 
-        # Chunk + embed + index
-        chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-        embeddings = embed_texts(embed_model, chunks)
-        index = build_faiss_index(embeddings)
+        print("--- Cross-encoder rerank vs dense ---")
+        report["rerank"] = compare_rerank(eval_items, index, query_model, chunks, reranker, [1, 3])
+        print()
 
-        print(f"Chunks: {len(chunks)} | Index size: {index.ntotal}")
+        print("--- Compressed storage modes ---")
+        report["storage"] = compare_storage_modes(eval_items, embeddings, question_embeddings, chunks, [3, 5])
 
-        for k in [3, 5]:
-            p, hits, missed = precision_at_k(eval_items, index, embed_model, chunks, k=k)
-            print(f"\nprecision@{k}: {p:.2f} ({hits}/{len(eval_items)})")
-            print(f"missed@{k}: {missed}\n")
+    full_report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "embed_model": query_model.name,
+        "corpus": {"path": "data.txt", "sha256": file_sha256("data.txt")},
+        "eval_set": {"path": "eval_set.jsonl", "questions": len(eval_items)},
+        "ks": ks,
+        "configs": [report for report, _ in outputs],
+    }
+    Path(report_path).write_text(json.dumps(full_report, indent=2), encoding="utf-8")
+    print(f"\n📝 Wrote JSON report to {report_path}")
@@ -0,0 +1,43 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import sys
+import time
+
+from rag.embedders import load_backend
+from rag.incremental import IncrementalIndex, read_documents
+
+
+# -------------------------------------------------
+# Incremental (re-)ingestion of a folder of .txt docs
+#
+#   python 13_incremental_ingest.py [docs_dir] [store_dir]
+#
+# Only new or changed documents are embedded; deleted documents are removed
+# from the index. Safe to run nightly.
+# -------------------------------------------------
+if __name__ == "__main__":
+    docs_dir = sys.argv[1] if len(sys.argv) > 1 else "docs"
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else ".rag_index_incremental"
+
+    embed_model = load_backend()
+    dim = embed_model.get_sentence_embedding_dimension()
+
+    inc = IncrementalIndex.open(store_dir, dim=dim, model_name=embed_model.name)
+    print(f"✅ Opened index: {len(inc.docs)} docs, {inc.ntotal} chunks")
+
+    documents = read_documents(docs_dir)
+    print(f"📄 Found {len(documents)} documents in {docs_dir}")
+
+    start = time.perf_counter()
+    stats = inc.sync(documents, embed_model)
+    elapsed = time.perf_counter() - start
+
+    inc.save(store_dir)
+
+    print(
+        f"✅ Sync done in {elapsed:.2f}s | added={stats['added']} updated={stats['updated']} "
+        f"deleted={stats['deleted']} unchanged={stats['unchanged']} "
+        f"chunks_embedded={stats['chunks_embedded']}"
+    )
+    print(f"✅ Index size: {inc.ntotal} chunks")
@@ -0,0 +1,103 @@
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from rag.ann import INDEX_TYPES, PQ_MIN_TRAIN_POINTS, build_ann_index, recall_at_k, search
+
+
+# -------------------------------------------------
+# ANN benchmark: recall@k vs exact flat search + p50/p99 latency
+#
+#   python 14_bench_ann_indexes.py [sizes] [index_types]
+#   python 14_bench_ann_indexes.py 10000,100000,1000000 flat,hnsw,ivf_flat,ivf_pq
+#
+# Vectors are synthetic (clustered like real sentence embeddings, dim=384)
+# so the benchmark runs without a corpus or the embedding model.
+# -------------------------------------------------
+DIM = 384
+NUM_QUERIES = 200
+K = 10
+TARGET_MS = 10.0
+
+# query-time knob sweeps per index type
+KNOBS = {
+    "flat": [{}],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128)],
+    "ivf_flat": [{"nprobe": n} for n in (4, 8, 16, 32, 64)],
+    "ivf_pq": [{"nprobe": n} for n in (4, 8, 16, 32, 64)],
+}
+
+
+def make_clustered_vectors(n, dim, num_clusters=1000, noise=0.6, seed=0, block=100_000):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype("float32")
+    out = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, block):
+        end = min(start + block, n)
+        labels = rng.integers(0, num_clusters, size=end - start)
+        out[start:end] = centers[labels] + noise * rng.standard_normal((end - start, dim)).astype("float32")
+    faiss.normalize_L2(out)
+    return out
+
+
+def make_queries(vectors, num_queries, noise=0.3, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(vectors.shape[0], size=num_queries, replace=False)
+    jitter = rng.standard_normal((num_queries, vectors.shape[1])) / np.sqrt(vectors.shape[1])
+    queries = (vectors[rows] + noise * jitter).astype("float32")
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def time_single_queries(index, queries, k, **knobs):
+    """One query per call, like the interactive apps. Returns (ids, latencies_ms)."""
+    ids = np.empty((len(queries), k), dtype="int64")
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, row_ids = search(index, queries[i:i + 1], k, **knobs)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        ids[i] = row_ids[0]
+    return ids, latencies
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+    index_types = (sys.argv[2] if len(sys.argv) > 2 else ",".join(INDEX_TYPES)).split(",")
+
+    print(f"faiss threads: {faiss.omp_get_max_threads()} | dim={DIM} | queries={NUM_QUERIES} | k={K}\n")
+    header = f"{'n':>9} {'index':>9} {'knob':>13} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8}"
+
+    for n in sizes:
+        vectors = make_clustered_vectors(n, DIM)
+        queries = make_queries(vectors, NUM_QUERIES)
+
+        exact = faiss.IndexFlatIP(DIM)
+        exact.add(vectors)
+        _, exact_ids = exact.search(queries, K)
+
+        print(header)
+        print("-" * len(header))
+
+        for index_type in index_types:
+            if index_type == "ivf_pq" and n < PQ_MIN_TRAIN_POINTS:
+                print(f"{n:>9} {index_type:>9} skipped (needs >= {PQ_MIN_TRAIN_POINTS} vectors)")
+                continue
+            start = time.perf_counter()
+            index = build_ann_index(vectors, index_type)
+            build_s = time.perf_counter() - start
+
+            for knobs in KNOBS[index_type]:
+                ids, latencies = time_single_queries(index, queries, K, **knobs)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                knob = ",".join(f"{key}={value}" for key, value in knobs.items()) or "-"
+                flag = "" if p99 <= TARGET_MS else "  (over target)"
+                print(
+                    f"{n:>9} {index_type:>9} {knob:>13} {build_s:>8.2f} "
+                    f"{recall_at_k(ids, exact_ids):>9.3f} {p50:>8.3f} {p99:>8.3f}{flag}"
+                )
+
+            del index
+        print()
@@ -0,0 +1,42 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import sys
+
+from rag.embedders import load_backend
+from rag.ingest import ingest_directory
+from rag.mmap_store import MmapChunkStore, MmapFlatIndex
+
+
+# -------------------------------------------------
+# Streaming ingestion of a whole directory with bounded memory
+#
+#   python 15_stream_ingest_directory.py [docs_dir] [store_dir] [batch_size]
+#
+# Files are streamed in segments, embedded in fixed-size batches and written
+# to a memory-mapped store, so RAM use depends on batch size, not corpus size.
+# -------------------------------------------------
+if __name__ == "__main__":
+    docs_dir = sys.argv[1] if len(sys.argv) > 1 else "docs"
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else ".rag_index_stream"
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+
+    embed_model = load_backend()
+
+    print(f"🚀 Ingesting {docs_dir} -> {store_dir} (batch_size={batch_size})\n")
+    stats = ingest_directory(docs_dir, embed_model, store_dir, batch_size=batch_size)
+    print(
+        f"\n✅ Done: {stats['files']} files | {stats['chunks']} chunks | "
+        f"{stats['seconds']:.1f}s | {stats['chunks_per_sec']:.0f} chunks/s"
+    )
+
+    # Quick sanity query straight from the on-disk store
+    store = MmapChunkStore(store_dir)
+    index = MmapFlatIndex(store.embeddings)
+    q_emb = embed_model.encode(["What is RAG?"], convert_to_numpy=True, normalize_embeddings=True)
+    scores, ids = index.search(q_emb.astype("float32"), 3)
+    print("\n🔎 Sample query: What is RAG?")
+    for idx, score in zip(ids[0], scores[0]):
+        if idx != -1:
+            print(f"--- score={score:.4f} | chunk_id={idx} ---")
+            print(store[idx])
@@ -0,0 +1,68 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import sys
+import time
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from rag.core import embed_texts
+from rag.parallel_embed import ParallelEmbedder
+
+
+# -------------------------------------------------
+# Embedding throughput (chunks/sec) vs number of worker processes
+#
+#   python 16_bench_parallel_embedding.py [num_chunks] [batch_size]
+#
+# Baseline: one process, torch using every core.
+# Parallel: N processes x 1 torch thread each (model load excluded from timing).
+# -------------------------------------------------
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def make_chunks(num_chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    words = open("data.txt", encoding="utf-8").read().split()
+    # ~200 chars per chunk, like the default chunker
+    return [" ".join(rng.choice(words, size=32)) for _ in range(num_chunks)]
+
+
+def worker_counts(cores):
+    counts, n = [], 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    return counts + [cores]
+
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    cores = os.cpu_count() or 1
+    chunks = make_chunks(num_chunks)
+
+    print(f"cores={cores} | chunks={num_chunks} | batch_size={batch_size}\n")
+    print(f"{'mode':>22} {'seconds':>8} {'chunks/s':>9} {'speedup':>8}")
+
+    # Baseline: single process
+    torch.set_num_threads(cores)
+    model = SentenceTransformer(MODEL_NAME)
+    embed_texts(model, chunks[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    baseline = embed_texts(model, chunks, batch_size=batch_size)
+    base_s = time.perf_counter() - start
+    print(f"{f'1 proc x {cores} threads':>22} {base_s:>8.2f} {num_chunks / base_s:>9.0f} {1.0:>8.2f}")
+
+    for workers in worker_counts(cores):
+        with ParallelEmbedder(MODEL_NAME, num_workers=workers, torch_threads=1, batch_size=batch_size) as embedder:
+            embedder.warm_up()
+            start = time.perf_counter()
+            parallel = embed_texts(embedder, chunks, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+
+        # order must be preserved: row i is still chunk i
+        assert np.allclose(parallel, baseline, atol=1e-4), "parallel output differs from baseline"
+        print(f"{f'{workers} procs x 1 thread':>22} {elapsed:>8.2f} {num_chunks / elapsed:>9.0f} {base_s / elapsed:>8.2f}")
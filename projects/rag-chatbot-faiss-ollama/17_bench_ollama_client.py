@@ -0,0 +1,77 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from rag.ollama_client import OllamaClient
+
+
+# -------------------------------------------------
+# Per-answer overhead: `ollama run` subprocess vs pooled HTTP client
+#
+#   python 17_bench_ollama_client.py [model] [num_calls]
+#
+# Both paths are timed to the first answer token with the same prompt and
+# default options (`ollama run` has no flag to cap the output length), so
+# the numbers are call overhead (process spawn, CLI startup, model (re)load)
+# plus prompt eval, not generation. Every call runs to completion and a
+# failed call aborts the benchmark.
+# -------------------------------------------------
+PROMPT = "Reply with the single word: ok"
+
+
+def bench_subprocess(model, num_calls):
+    latencies = []
+    for _ in range(num_calls):
+        # stderr goes to a file, not a pipe: a full stderr pipe would block the
+        # CLI while we wait on stdout (deadlock)
+        with tempfile.TemporaryFile() as stderr_file:
+            start = time.perf_counter()
+            proc = subprocess.Popen(["ollama", "run", model, PROMPT], stdout=subprocess.PIPE, stderr=stderr_file)
+            first = proc.stdout.read(1)  # blocks until the CLI prints the first token
+            latency = (time.perf_counter() - start) * 1000
+            proc.communicate()  # drain the rest of the answer and wait for exit
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", errors="replace").strip()
+        if proc.returncode != 0 or not first:
+            raise SystemExit(f"❌ `ollama run {model}` failed (exit {proc.returncode}): {stderr}")
+        latencies.append(latency)
+    return np.array(latencies)
+
+
+def bench_http(client, model, num_calls):
+    latencies = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        latency = None
+        for _token in client.generate_stream(PROMPT, model=model):  # OllamaError on failure
+            if latency is None:
+                latency = (time.perf_counter() - start) * 1000
+        if latency is None:
+            raise SystemExit(f"❌ {model} returned an empty answer")
+        latencies.append(latency)
+    return np.array(latencies)
+
+
+def report(name, latencies):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{name:>18} | mean {latencies.mean():8.1f} ms | p50 {p50:8.1f} ms | p95 {p95:8.1f} ms")
+
+
+if __name__ == "__main__":
+    model = sys.argv[1] if len(sys.argv) > 1 else "llama3.2:3b"
+    num_calls = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    client = OllamaClient(keep_alive="10m")
+    client.generate(PROMPT, model=model, options={"num_predict": 1})  # load model once for both paths
+
+    print(f"model={model} | calls={num_calls} | time to first token\n")
+    report("pooled HTTP", bench_http(client, model, num_calls))
+
+    if shutil.which("ollama"):
+        report("subprocess CLI", bench_subprocess(model, num_calls))
+    else:
+        print("subprocess CLI     | skipped (ollama binary not on PATH)")
@@ -0,0 +1,155 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from rag.batcher import MicroBatcher
+from rag.embedders import load_backend
+from rag.index_store import load_or_build_index
+from rag.ollama_client import DEFAULT_OLLAMA_MODEL, OllamaError, get_client
+
+
+# -------------------------------------------------
+# RAG HTTP service
+#
+#   python 18_rag_api_service.py            -> http://localhost:8000/docs
+#
+# Concurrent requests are collected for up to 5 ms and retrieved together:
+# one model.encode + one index.search per window instead of per request.
+# -------------------------------------------------
+BATCH_WINDOW_MS = 5.0
+MAX_BATCH = 64
+
+
+class RetrieveRequest(BaseModel):
+    question: str = Field(min_length=1)
+    k: int = Field(default=3, ge=1, le=20)
+
+
+class QueryRequest(RetrieveRequest):
+    model: str = DEFAULT_OLLAMA_MODEL
+
+
+class Source(BaseModel):
+    chunk_id: int
+    score: float
+    text: str
+
+
+class RetrieveResponse(BaseModel):
+    sources: list[Source]
+    retrieve_ms: float
+
+
+class QueryResponse(RetrieveResponse):
+    answer: str
+    generate_ms: float
+
+
+# -------------------------------------------------
+# 1) Load model + index once, start the micro-batcher
+# -------------------------------------------------
+state = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    embed_model = load_backend()
+    index, chunks = load_or_build_index("data.txt", embed_model, model_name=embed_model.name)
+
+    batcher = MicroBatcher(index, embed_model, chunks, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH)
+    batcher.start()
+    state.update(index=index, chunks=chunks, batcher=batcher)
+    yield
+    await batcher.stop()
+
+
+app = FastAPI(
+    title="RAG Chatbot API",
+    description="FAISS retrieval + Ollama generation with micro-batched query embedding",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+
+# -------------------------------------------------
+# 2) Retrieve (batched) + generate
+# -------------------------------------------------
+async def retrieve_top_chunks(question: str, k: int = 3):
+    return await state["batcher"].retrieve(question, k)
+
+
+def generate_answer_with_ollama(question: str, retrieved_chunks, model_name=DEFAULT_OLLAMA_MODEL):
+    context = "\n\n".join([f"[Source {i+1}] {c}" for i, c in enumerate(retrieved_chunks)])
+
+    prompt = f"""
+You are a helpful assistant.
+Answer the question using ONLY the context below.
+If the answer is not in the context, say:
+"I don't know based on the provided documents."
+
+CONTEXT:
+{context}
+
+QUESTION:
+{question}
+
+ANSWER (clear and short):
+""".strip()
+
+    return get_client().generate(prompt, model=model_name)
+
+
+# -------------------------------------------------
+# 3) Endpoints
+# -------------------------------------------------
+@app.get("/health")
+async def health():
+    return {
+        "status": "healthy",
+        "chunks": state["index"].ntotal,
+        "batcher": state["batcher"].stats(),
+    }
+
+
+@app.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve(request: RetrieveRequest):
+    start = time.perf_counter()
+    results = await retrieve_top_chunks(request.question, request.k)
+    return RetrieveResponse(
+        sources=[Source(chunk_id=i, score=score, text=text) for i, score, text in results],
+        retrieve_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(request: QueryRequest):
+    start = time.perf_counter()
+    results = await retrieve_top_chunks(request.question, request.k)
+    retrieve_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    try:
+        # blocking HTTP call to Ollama -> worker thread, event loop stays free
+        answer = await asyncio.to_thread(
+            generate_answer_with_ollama, request.question, [text for _, _, text in results], request.model
+        )
+    except OllamaError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    return QueryResponse(
+        answer=answer,
+        sources=[Source(chunk_id=i, score=score, text=text) for i, score, text in results],
+        retrieve_ms=retrieve_ms,
+        generate_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,159 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from rag.ann import INDEX_TYPES, PQ_MIN_TRAIN_POINTS, build_ann_index, recall_at_k, search
+from rag.core import embed_texts
+from rag.embedders import DEFAULT_BACKEND, load_backend
+from rag.evaluation import latency_summary
+from rag.synthetic import SyntheticCorpus
+
+
+# -------------------------------------------------
+# Scaling benchmark on a synthetic corpus (capacity planning)
+#
+#   python 19_bench_scaling.py [sizes] [index_types] [batch_size] [embedding backend]
+#   python 19_bench_scaling.py 1000,10000,100000 flat,hnsw,ivf_flat,ivf_pq 256 onnx-int8
+#
+# Per corpus size: ingestion throughput (generate + embed), then per index
+# type (each in a fresh process): build time, index size, peak RSS growth
+# of building + searching it, single-query search latency,
+# recall@k vs exact search and hit@k on the planted gold passages.
+# Embeddings stream into a memory-mapped .npy under .rag_bench/, so corpus
+# size is bounded by disk, not RAM.
+# -------------------------------------------------
+NUM_QUERIES = 200
+K = 10
+BENCH_DIR = ".rag_bench"
+
+# one mid-range operating point per index type (see 14_bench_ann_indexes.py for sweeps)
+KNOBS = {"flat": {}, "hnsw": {"ef_search": 64}, "ivf_flat": {"nprobe": 16}, "ivf_pq": {"nprobe": 16}}
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux)."""
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6  # KB on Linux
+
+
+def index_size_mb(index) -> float:
+    """Serialized size (what a node has to load), without a second copy in RAM."""
+    with tempfile.NamedTemporaryFile(dir=BENCH_DIR, suffix=".faiss") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name) / 1e6
+
+
+def ingest(corpus, model, dim, batch_size):
+    """Stream generated chunks through the model into an on-disk matrix. Returns (embeddings, seconds)."""
+    path = Path(BENCH_DIR) / f"embeddings_{len(corpus)}.npy"
+    embeddings = np.lib.format.open_memmap(path, mode="w+", dtype="float32", shape=(len(corpus), dim))
+
+    start = time.perf_counter()
+    batch, row = [], 0
+    for text in corpus.iter_chunks():
+        batch.append(text)
+        if len(batch) == batch_size:
+            embeddings[row:row + len(batch)] = embed_texts(model, batch, batch_size=batch_size)
+            row += len(batch)
+            batch = []
+    if batch:
+        embeddings[row:row + len(batch)] = embed_texts(model, batch, batch_size=batch_size)
+    embeddings.flush()
+    return embeddings, time.perf_counter() - start
+
+
+def time_single_queries(index, queries, k, **knobs):
+    ids = np.empty((len(queries), k), dtype="int64")
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, row_ids = search(index, queries[i:i + 1], k, **knobs)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        ids[i] = row_ids[0]
+    return ids, latencies
+
+
+def bench_index(embeddings_path, query_embeddings, index_type, k):
+    """
+    Build + search one index type; runs in its own process, so the peak RSS
+    growth over the post-import baseline belongs to this config alone
+    (ru_maxrss is a process-lifetime peak). Includes the embedding pages read
+    from the memory-mapped file.
+    """
+    baseline = rss_mb()
+    embeddings = np.load(embeddings_path, mmap_mode="r")
+
+    start = time.perf_counter()
+    index = build_ann_index(embeddings, index_type)
+    build_s = time.perf_counter() - start
+
+    ids, latencies = time_single_queries(index, query_embeddings, k, **KNOBS[index_type])
+    return build_s, index_size_mb(index), peak_rss_mb() - baseline, ids, latencies
+
+
+if __name__ == "__main__":
+    sizes = [int(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "1000,10000,100000").split(",")]
+    index_types = (sys.argv[2] if len(sys.argv) > 2 else ",".join(INDEX_TYPES)).split(",")
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+    backend = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_BACKEND
+
+    Path(BENCH_DIR).mkdir(exist_ok=True)
+    model = load_backend(backend)
+    dim = model.get_sentence_embedding_dimension()
+    print(f"faiss threads: {faiss.omp_get_max_threads()} | embeddings={model.name} | queries={NUM_QUERIES} | k={K}\n")
+
+    header = (
+        f"{'n':>9} {'index':>9} {'build_s':>8} {'size_mb':>9} {'+rss_mb':>8} "
+        f"{'p50_ms':>7} {'p95_ms':>7} {'p99_ms':>7} {'recall@k':>9} {'gold_hit@k':>10}"
+    )
+
+    for n in sizes:
+        corpus = SyntheticCorpus(n, seed=0, num_queries=NUM_QUERIES)
+        queries = corpus.queries()
+        gold_ids = np.array([item["gold_id"] for item in queries])
+
+        embeddings, ingest_s = ingest(corpus, model, dim, batch_size)
+        query_embeddings = embed_texts(model, [item["question"] for item in queries])
+        print(f"📥 n={n}: ingested in {ingest_s:.1f}s ({n / ingest_s:.0f} chunks/s, generate + embed)")
+
+        exact = build_ann_index(embeddings, "flat")
+        _, exact_ids = exact.search(query_embeddings, K)
+        del exact
+
+        print(header)
+        print("-" * len(header))
+        for index_type in index_types:
+            if index_type == "ivf_pq" and n < PQ_MIN_TRAIN_POINTS:
+                print(f"{n:>9} {index_type:>9} skipped (needs >= {PQ_MIN_TRAIN_POINTS} vectors)")
+                continue
+            # fresh process per config: memory of earlier configs can't hide or inflate this one
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                build_s, size_mb, rss_growth_mb, ids, latencies = pool.submit(
+                    bench_index, embeddings.filename, query_embeddings, index_type, K
+                ).result()
+            latency = latency_summary(latencies)
+            gold_hit = float(np.mean([gold in row for gold, row in zip(gold_ids, ids)]))
+            print(
+                f"{n:>9} {index_type:>9} {build_s:>8.2f} {size_mb:>9.1f} {rss_growth_mb:>8.0f} "
+                f"{latency['p50']:>7.3f} {latency['p95']:>7.3f} {latency['p99']:>7.3f} "
+                f"{recall_at_k(ids, exact_ids):>9.3f} {gold_hit:>10.3f}"
+            )
+        print()
+
+        del embeddings
+        (Path(BENCH_DIR) / f"embeddings_{n}.npy").unlink()
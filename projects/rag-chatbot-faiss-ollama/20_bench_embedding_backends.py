@@ -0,0 +1,79 @@
+import os
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+import sys
+import time
+
+import numpy as np
+
+from rag.embedders import BACKENDS, load_backend, parity
+from rag.evaluation import latency_summary
+from rag.synthetic import SyntheticCorpus
+
+
+# -------------------------------------------------
+# Embedding backend benchmark (CPU)
+#
+#   python 20_bench_embedding_backends.py [backends] [num_chunks]
+#   python 20_bench_embedding_backends.py sentence-transformers,onnx,onnx-int8 2000
+#
+# Per backend: load time (incl. one-time ONNX export / quantization),
+# chunk throughput at ingestion batch size, single-query latency (what a
+# user waits for) and cosine parity with the first backend in the list.
+# -------------------------------------------------
+BATCH_SIZE = 64
+NUM_QUERIES = 200
+
+
+def time_chunks(model, chunks):
+    start = time.perf_counter()
+    model.encode(chunks, batch_size=BATCH_SIZE, normalize_embeddings=True)
+    return len(chunks) / (time.perf_counter() - start)
+
+
+def time_queries(model, questions):
+    latencies = np.empty(len(questions))
+    for i, question in enumerate(questions):
+        start = time.perf_counter()
+        model.encode([question], normalize_embeddings=True)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return latency_summary(latencies)
+
+
+if __name__ == "__main__":
+    backends = (sys.argv[1] if len(sys.argv) > 1 else ",".join(BACKENDS)).split(",")
+    num_chunks = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    corpus = SyntheticCorpus(num_chunks, seed=0, num_queries=NUM_QUERIES)
+    chunks = corpus.chunks()
+    questions = [item["question"] for item in corpus.queries()]
+    print(f"🧪 {len(chunks)} chunks (batch {BATCH_SIZE}) | {len(questions)} single queries\n")
+
+    header = (
+        f"{'backend':>22} {'load_s':>7} {'chunks/s':>9} {'q_p50_ms':>9} {'q_p95_ms':>9} "
+        f"{'q/s':>7} {'mean_cos':>9} {'p5_cos':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    reference = None
+    for backend in backends:
+        start = time.perf_counter()
+        model = load_backend(backend)
+        load_s = time.perf_counter() - start
+
+        model.encode(chunks[:BATCH_SIZE], batch_size=BATCH_SIZE)  # warm-up (allocations, graph init)
+        chunks_per_s = time_chunks(model, chunks)
+        latency = time_queries(model, questions)
+
+        if reference is None:
+            reference, agreement = model, {"mean_cosine": 1.0, "p5_cosine": 1.0}
+        else:
+            agreement = parity(reference, model, chunks[:500] + questions)
+
+        print(
+            f"{backend:>22} {load_s:>7.2f} {chunks_per_s:>9.0f} {latency['p50']:>9.2f} {latency['p95']:>9.2f} "
+            f"{1000 / latency['mean']:>7.0f} {agreement['mean_cosine']:>9.4f} {agreement['p5_cosine']:>7.4f}"
+        )
+
+    print(f"\nParity is cosine vs {backends[0]}; the hashing backend is not a model and is expected to disagree.")
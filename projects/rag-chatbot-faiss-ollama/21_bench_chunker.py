@@ -0,0 +1,90 @@
+import sys
+import time
+from pathlib import Path
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from rag.chunking import split_spans
+from rag.synthetic import SyntheticCorpus
+
+
+# -------------------------------------------------
+# Chunker throughput: LangChain splitter vs rag.chunking span chunker
+#
+#   python 21_bench_chunker.py [sizes_mb] [chunk_size] [chunk_overlap] [text file]
+#   python 21_bench_chunker.py 1,8,32 200 40
+#
+# Input is synthetic prose (paragraphs of SyntheticCorpus chunks), or the
+# given file repeated up to each size. Reports MB/s and the memory held by
+# the result: one str object per chunk vs two int64 offset arrays.
+# -------------------------------------------------
+REPEATS = 3
+
+
+def make_text(size_mb: float, source_file: str = None) -> str:
+    target = int(size_mb * 1_000_000)
+    if source_file:
+        base = Path(source_file).read_text(encoding="utf-8")
+        return (base * (target // max(len(base), 1) + 1))[:target]
+
+    # ~6 chunks per paragraph, single newlines inside, blank lines between paragraphs
+    corpus = SyntheticCorpus(max(target // 200, 1), seed=0, num_queries=0)
+    paragraphs, size, lines = [], 0, []
+    for i, chunk in enumerate(corpus.iter_chunks()):
+        lines.append(chunk)
+        if i % 6 == 5:
+            paragraphs.append("\n".join(lines))
+            size += sum(len(line) + 1 for line in lines)
+            lines = []
+            if size >= target:
+                break
+    return "\n\n".join(paragraphs)[:target]
+
+
+def best_of(fn):
+    best, result = float("inf"), None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def str_list_bytes(strings) -> int:
+    return sys.getsizeof(strings) + sum(sys.getsizeof(s) for s in strings)
+
+
+if __name__ == "__main__":
+    sizes = [float(s) for s in (sys.argv[1] if len(sys.argv) > 1 else "1,8,32").split(",")]
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    chunk_overlap = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    source_file = sys.argv[4] if len(sys.argv) > 4 else None
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    offsets_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+    print(f"🧪 chunk_size={chunk_size} overlap={chunk_overlap} | best of {REPEATS} | input: {source_file or 'synthetic'}\n")
+
+    header = f"{'MB':>6} {'chunker':>24} {'seconds':>8} {'MB/s':>7} {'chunks':>9} {'result_MB':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for size_mb in sizes:
+        text = make_text(size_mb, source_file)
+        mb = len(text.encode("utf-8")) / 1e6
+
+        lc_s, lc_chunks = best_of(lambda: splitter.split_text(text))
+        lc_off_s, lc_docs = best_of(lambda: offsets_splitter.create_documents([text]))
+        span_s, spans = best_of(lambda: split_spans(text, chunk_size, chunk_overlap))
+        mat_s, span_chunks = best_of(lambda: split_spans(text, chunk_size, chunk_overlap).to_list())
+
+        rows = [
+            ("langchain split_text", lc_s, len(lc_chunks), str_list_bytes(lc_chunks)),
+            ("langchain + start_index", lc_off_s, len(lc_docs), str_list_bytes([d.page_content for d in lc_docs])),
+            ("spans (offsets only)", span_s, len(spans), spans.starts.nbytes + spans.ends.nbytes),
+            ("spans + materialize", mat_s, len(span_chunks), str_list_bytes(span_chunks)),
+        ]
+        for name, seconds, count, result_bytes in rows:
+            print(f"{mb:>6.1f} {name:>24} {seconds:>8.3f} {mb / seconds:>7.1f} {count:>9} {result_bytes / 1e6:>10.1f}")
+
+        same = span_chunks == lc_chunks
+        print(f"{'':>6} identical chunks: {'✅' if same else '❌'} | speedup (offsets only): {lc_s / span_s:.1f}x\n")
@@ -0,0 +1,29 @@
+# rag/__init__.py
+
+"""
+RAG Package
+
+Shared building blocks for the numbered RAG scripts in this project.
+"""
+
+from .core import (
+    DEFAULT_EMBED_MODEL,
+    build_faiss_index,
+    chunk_text,
+    embed_texts,
+    load_text_file,
+    retrieve_batch,
+)
+from .incremental import IncrementalIndex
+from .index_store import load_or_build_index
+
+__all__ = [
+    "DEFAULT_EMBED_MODEL",
+    "IncrementalIndex",
+    "build_faiss_index",
+    "chunk_text",
+    "embed_texts",
+    "load_text_file",
+    "load_or_build_index",
+    "retrieve_batch",
+]
@@ -0,0 +1,157 @@
+# rag/ann.py
+
+"""
+ANN Index Factory
+
+Builds one of several FAISS index types over normalized embeddings
+(inner product == cosine similarity):
+
+- "flat"     -> IndexFlatIP, exact search (baseline, cost grows with corpus size)
+- "hnsw"     -> IndexHNSWFlat, graph search, no training needed
+- "ivf_flat" -> IndexIVFFlat, k-means buckets, full vectors inside each bucket
+- "ivf_pq"   -> IndexIVFPQ, k-means buckets + product-quantized vectors (small RAM)
+
+Query-time knobs:
+- nprobe    -> how many IVF buckets to scan (higher = better recall, slower)
+- ef_search -> HNSW candidate list size (higher = better recall, slower)
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# faiss warns below ~39 training points per centroid; 64 gives stable centroids
+TRAIN_POINTS_PER_CENTROID = 64
+# 8-bit PQ codebooks have 256 centroids per sub-quantizer, each wants ~39 points;
+# build_ann_index refuses "ivf_pq" below this (use "ivf_flat" or "flat")
+PQ_MIN_TRAIN_POINTS = 256 * 39
+
+
+def default_nlist(num_vectors: int) -> int:
+    """Rule of thumb: ~4 * sqrt(n) buckets, but keep enough points per bucket."""
+    nlist = int(4 * math.sqrt(max(num_vectors, 1)))
+    return max(1, min(nlist, num_vectors // TRAIN_POINTS_PER_CENTROID or 1))
+
+
+def default_pq_m(dim: int) -> int:
+    """Largest sub-quantizer count <= dim/8 that divides dim (384 -> 48)."""
+    for m in range(max(dim // 8, 1), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def select_training_sample(embeddings: np.ndarray, num_points: int, seed: int = 0) -> np.ndarray:
+    """Uniform random sample (without replacement) used to train IVF / PQ."""
+    n = embeddings.shape[0]
+    if num_points >= n:
+        return np.ascontiguousarray(embeddings, dtype="float32")
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(n, size=num_points, replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype="float32")
+
+
+def build_ann_index(
+    embeddings: np.ndarray,
+    index_type: str = "flat",
+    nlist: int = None,
+    pq_m: int = None,
+    pq_bits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200,
+    train_size: int = None,
+    seed: int = 0,
+):
+    """Build and fill an index of `index_type` from a (n, dim) float32 matrix."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type={index_type!r}, expected one of {INDEX_TYPES}")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n, dim = embeddings.shape
+    if index_type == "ivf_pq" and n < PQ_MIN_TRAIN_POINTS:
+        raise ValueError(
+            f"index_type='ivf_pq' needs at least {PQ_MIN_TRAIN_POINTS} vectors to train its codebooks, "
+            f"got {n}; use 'ivf_flat' or 'flat' for a corpus this small"
+        )
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            min_train = nlist * TRAIN_POINTS_PER_CENTROID
+        else:
+            pq_m = pq_m or default_pq_m(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+            min_train = max(nlist * TRAIN_POINTS_PER_CENTROID, PQ_MIN_TRAIN_POINTS)
+
+        index.train(select_training_sample(embeddings, train_size or min_train, seed=seed))
+
+    index.add(embeddings)
+    return index
+
+
+def search_params(index, nprobe: int = None, ef_search: int = None, selector=None):
+    """
+    Per-call search parameters (thread-safe, unlike setting index.nprobe),
+    or None when the index type has no knobs to turn and no selector is given.
+    selector (a faiss.IDSelector) restricts the search to the selected ids.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and (nprobe is not None or selector is not None):
+        return faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe, sel=selector)
+    if isinstance(index, faiss.IndexHNSW) and (ef_search is not None or selector is not None):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or index.hnsw.efSearch, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def bitmap_selector(mask: np.ndarray):
+    """faiss.IDSelectorBitmap for a boolean mask over ids (bit i = id i)."""
+    return faiss.IDSelectorBitmap(np.packbits(mask, bitorder="little"))
+
+
+def search(index, query_embeddings: np.ndarray, k: int = 3, nprobe: int = None, ef_search: int = None, selector=None, mask: np.ndarray = None):
+    """
+    index.search with optional nprobe / ef_search overrides and a filter:
+    selector (faiss.IDSelector) or mask (boolean over ids). A mask also
+    works for rag.mmap_store.MmapFlatIndex, which is not a faiss index.
+    """
+    if not isinstance(index, faiss.Index):
+        if selector is not None:
+            raise TypeError(f"{type(index).__name__} takes a boolean mask, not a faiss selector")
+        if mask is None:
+            return index.search(query_embeddings, k)
+        return index.search(query_embeddings, k, mask=mask)
+    if mask is not None:
+        selector = bitmap_selector(mask)
+    params = search_params(index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+    if params is None:
+        return index.search(query_embeddings, k)
+    return index.search(query_embeddings, k, params=params)
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """
+    Fraction of the exact top-k ids that the approximate search also found
+    (-1 padding, returned when k > index size, is ignored).
+    """
+    k = exact_ids.shape[1]
+    found = total = 0
+    for approx, exact in zip(approx_ids, exact_ids):
+        exact = set(exact[exact != -1].tolist())
+        found += len(exact & set(approx[:k].tolist()))
+        total += len(exact)
+    return found / max(total, 1)
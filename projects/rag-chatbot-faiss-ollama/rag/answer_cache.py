@@ -0,0 +1,162 @@
+# rag/answer_cache.py
+
+"""
+Semantic Answer Cache
+
+Most traffic is paraphrases of the same few questions, and every answer
+costs seconds of local LLM time. This cache stores
+
+    (question embedding, retrieved chunk ids + scores, answer)
+
+and returns a stored answer when a new question's embedding has cosine
+similarity >= threshold with a cached one, for the same index version and
+namespace (e.g. the LLM model name). Entries are evicted LRU, persisted to
+disk (answers.json + vectors.npy) and hits / misses are counted.
+
+Each process rewrites its whole file on put(), so every app gets its own
+directory (app_cache_dir); a shared one would lose the other apps' entries.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from .index_store import DEFAULT_STORE_DIR, read_manifest
+
+
+DEFAULT_ANSWER_CACHE_DIR = ".rag_cache/answers"
+ENTRIES_FILE = "answers.json"
+VECTORS_FILE = "vectors.npy"
+
+
+def app_cache_dir(app: str) -> str:
+    """Per-app cache directory under DEFAULT_ANSWER_CACHE_DIR (e.g. .rag_cache/answers/citations)."""
+    return str(Path(DEFAULT_ANSWER_CACHE_DIR) / app)
+
+
+def manifest_version(store_dir: str = DEFAULT_STORE_DIR) -> str:
+    """
+    Stable index version (survives restarts): hash of the persisted index
+    manifest, which changes whenever the source, chunker or model changes.
+    """
+    manifest = read_manifest(store_dir) or {}
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticAnswerCache:
+    """
+    threshold -> min cosine similarity between question embeddings for a hit
+    max_size  -> entries kept (least recently used are evicted)
+    cache_dir -> where to persist entries (None = memory only)
+    """
+
+    def __init__(self, threshold: float = 0.92, max_size: int = 512, cache_dir: str = DEFAULT_ANSWER_CACHE_DIR):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> entry dict (LRU order)
+        self._vectors = {}             # key -> unit-norm question embedding
+        self._next_key = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            self._load()
+
+    # -------------------------
+    # Lookup / insert
+    # -------------------------
+    def lookup(self, question_embedding: np.ndarray, index_version: str, namespace: str = ""):
+        """
+        Best cached entry for this question (or None):
+        {"question", "answer", "results": [(chunk_id, score), ...], "similarity"}
+        """
+        q = np.asarray(question_embedding, dtype="float32").reshape(-1)
+        with self._lock:
+            keys = [
+                key for key, entry in self._entries.items()
+                if entry["index_version"] == index_version and entry["namespace"] == namespace
+            ]
+            if keys:
+                sims = np.stack([self._vectors[key] for key in keys]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(self._entries[key], similarity=float(sims[best]))
+            self.misses += 1
+            return None
+
+    def put(self, question: str, question_embedding: np.ndarray, results, answer: str, index_version: str, namespace: str = ""):
+        """results: the retrieved [(chunk_id, score, ...), ...] the answer was generated from."""
+        q = np.asarray(question_embedding, dtype="float32").reshape(-1)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "results": [(int(r[0]), float(r[1])) for r in results],
+            "index_version": index_version,
+            "namespace": namespace,
+        }
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = entry
+            self._vectors[key] = q
+            while len(self._entries) > self.max_size:
+                old_key, _ = self._entries.popitem(last=False)
+                del self._vectors[old_key]
+            if self.cache_dir:
+                self._save()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _save(self):
+        store = Path(self.cache_dir)
+        store.mkdir(parents=True, exist_ok=True)
+        keys = list(self._entries)
+
+        vectors = np.stack([self._vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype="float32")
+        with open(store / (VECTORS_FILE + ".tmp"), "wb") as f:
+            np.save(f, vectors)
+        os.replace(store / (VECTORS_FILE + ".tmp"), store / VECTORS_FILE)
+
+        entries = [self._entries[key] for key in keys]
+        tmp = store / (ENTRIES_FILE + ".tmp")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, store / ENTRIES_FILE)
+
+    def _load(self):
+        store = Path(self.cache_dir)
+        if not (store / ENTRIES_FILE).exists() or not (store / VECTORS_FILE).exists():
+            return
+        try:
+            entries = json.loads((store / ENTRIES_FILE).read_text(encoding="utf-8"))
+            vectors = np.load(store / VECTORS_FILE)
+        except (OSError, ValueError):
+            return
+        if len(entries) != len(vectors):
+            return
+
+        # file order is LRU order (oldest first)
+        for entry, vector in list(zip(entries, vectors))[-self.max_size:]:
+            key = self._next_key
+            self._next_key += 1
+            entry["results"] = [tuple(r) for r in entry["results"]]
+            self._entries[key] = entry
+            self._vectors[key] = vector.astype("float32")
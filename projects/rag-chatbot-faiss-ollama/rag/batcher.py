@@ -0,0 +1,106 @@
+# rag/batcher.py
+
+"""
+Micro-Batched Retrieval
+
+For the HTTP service: concurrent requests put their question on an asyncio
+queue; a single worker waits up to `window_ms` after the first arrival
+(or until `max_batch` questions are queued) and retrieves the whole window
+with one model.encode + one index.search (rag.core.retrieve_batch), in a
+worker thread so the event loop keeps accepting requests.
+
+Embedding and search overhead is then paid once per window instead of
+once per request.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .core import retrieve_batch
+
+
+class MicroBatcher:
+    """
+    window_ms -> how long to wait for more questions after the first one
+    max_batch -> flush early when this many questions are waiting
+    """
+
+    def __init__(self, index, model, chunks, window_ms: float = 5.0, max_batch: int = 64):
+        self.index = index
+        self.model = model
+        self.chunks = chunks
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self.max_seen = 0
+        self._queue = None
+        self._worker = None
+        # one thread: encode / search calls never overlap
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-batch")
+
+    def start(self):
+        """Start the worker task (call from inside the running event loop)."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def retrieve(self, query: str, k: int = 3):
+        """[(chunk_id, score, chunk_text), ...] for one question, batched with its neighbours."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, k, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            queries = [query for query, _, _ in batch]
+            max_k = max(k for _, k, _ in batch)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, retrieve_batch, self.index, self.model, queries, self.chunks, max_k
+                )
+            except Exception as exc:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            self.max_seen = max(self.max_seen, len(batch))
+            # results are best-first, so each request's top-k is a slice
+            for (_, k, future), rows in zip(batch, results):
+                if not future.done():
+                    future.set_result(rows[:k])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_seen,
+        }
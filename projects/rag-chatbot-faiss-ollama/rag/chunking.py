@@ -0,0 +1,135 @@
+# rag/chunking.py
+
+"""
+Span Chunker
+
+Same chunks as LangChain's RecursiveCharacterTextSplitter (default
+settings: separators "\\n\\n" -> "\\n" -> " " -> "", separator kept at the
+start of the next piece, whitespace stripped), but computed as
+(start, end) character offsets into the source string:
+
+- splitting and merging only move integers; separators are found with
+  str.find on the original buffer, so no substring is created until a
+  chunk is asked for
+- ChunkSpans materializes chunk i on access (text[start:end])
+- offsets are exact, unlike start_index recovered with text.find, which
+  points at the first occurrence of a repeated chunk
+
+Offsets let later stages merge neighbouring chunks or cite exact source
+ranges without searching strings.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", " ", "")
+
+
+class ChunkSpans:
+    """Chunks of `text` as two int64 offset arrays; behaves like a list of strings."""
+
+    def __init__(self, text: str, starts: np.ndarray, ends: np.ndarray):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> str:
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self):
+        text = self.text
+        for start, end in zip(self.starts.tolist(), self.ends.tolist()):
+            yield text[start:end]
+
+    def span(self, i: int) -> tuple:
+        return int(self.starts[i]), int(self.ends[i])
+
+    def to_list(self) -> list[str]:
+        return list(self)
+
+
+def _pieces(text: str, start: int, end: int, separator: str) -> list:
+    """text[start:end] split before each separator (kept at the piece start), empty pieces dropped."""
+    if not separator:
+        return [(i, i + 1) for i in range(start, end)]
+    pieces = []
+    piece_start = start
+    hit = text.find(separator, start, end)
+    while hit != -1:
+        if hit > piece_start:
+            pieces.append((piece_start, hit))
+        piece_start = hit
+        hit = text.find(separator, hit + len(separator), end)
+    if end > piece_start:
+        pieces.append((piece_start, end))
+    return pieces
+
+
+def _emit(text: str, start: int, end: int, out: list):
+    # strip whitespace by moving the offsets (same definition as str.strip)
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if end > start:
+        out.append((start, end))
+
+
+def _merge(text: str, pieces: list, chunk_size: int, chunk_overlap: int, out: list):
+    """Greedy merge of consecutive pieces up to chunk_size, carrying up to chunk_overlap chars."""
+    current = deque()
+    total = 0
+    for start, end in pieces:
+        length = end - start
+        if total + length > chunk_size and current:
+            _emit(text, current[0][0], current[-1][1], out)
+            while total > chunk_overlap or (total + length > chunk_size and total > 0):
+                first_start, first_end = current.popleft()
+                total -= first_end - first_start
+        current.append((start, end))
+        total += length
+    if current:
+        _emit(text, current[0][0], current[-1][1], out)
+
+
+def _split(text: str, start: int, end: int, separators, chunk_size: int, chunk_overlap: int, out: list):
+    separator = separators[-1]
+    remaining = ()
+    for i, candidate in enumerate(separators):
+        if not candidate:
+            separator = candidate
+            break
+        if text.find(candidate, start, end) != -1:
+            separator = candidate
+            remaining = separators[i + 1:]
+            break
+
+    good = []
+    for piece_start, piece_end in _pieces(text, start, end, separator):
+        if piece_end - piece_start < chunk_size:
+            good.append((piece_start, piece_end))
+            continue
+        if good:
+            _merge(text, good, chunk_size, chunk_overlap, out)
+            good = []
+        if not remaining:
+            out.append((piece_start, piece_end))
+        else:
+            _split(text, piece_start, piece_end, remaining, chunk_size, chunk_overlap, out)
+    if good:
+        _merge(text, good, chunk_size, chunk_overlap, out)
+
+
+def split_spans(text: str, chunk_size: int = 200, chunk_overlap: int = 40, separators=DEFAULT_SEPARATORS) -> ChunkSpans:
+    """Chunk offsets for text (chunk i == RecursiveCharacterTextSplitter(...).split_text(text)[i])."""
+    if chunk_overlap > chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+    out = []
+    _split(text, 0, len(text), tuple(separators), chunk_size, chunk_overlap, out)
+    offsets = np.array(out, dtype="int64").reshape(-1, 2)
+    return ChunkSpans(text, offsets[:, 0].copy(), offsets[:, 1].copy())
@@ -0,0 +1,85 @@
+# rag/conversation.py
+
+"""
+Ollama Conversation with Context Reuse
+
+Sending the whole chat history in every prompt makes the model re-read
+every previous turn, so prompt evaluation grows with the conversation.
+/api/generate returns `context`, the token array of prompt + answer.
+Passing it back with the next request continues from those tokens, and
+Ollama reuses the KV cache for the matching prefix. Only the new question
+and its retrieved chunks are evaluated.
+
+- the static instructions go in `system`, once, at the start of a context
+- every turn records prompt_eval_count / prompt_eval_ms (tokens actually
+  evaluated) and the carried context length
+- when the carried context plus the next prompt would outgrow the window
+  (max_context_tokens: num_ctx minus room for the answer), it is dropped and
+  the turn starts fresh; start_turn() tells the caller to put a short text
+  history in that prompt
+"""
+
+from .ollama_client import DEFAULT_OLLAMA_MODEL, get_client
+
+
+class ContextConversation:
+    """
+    system             -> stable instructions, evaluated once per context
+    max_context_tokens -> carried + new prompt tokens before a reset (num_ctx
+                          minus num_predict, so the answer still fits)
+    """
+
+    def __init__(self, system: str, model: str = DEFAULT_OLLAMA_MODEL, max_context_tokens: int = 3072, client=None):
+        self.system = system
+        self.model = model
+        self.max_context_tokens = max_context_tokens
+        self.client = client or get_client()
+        self.context = None
+        self.turns = []
+        self.resets = 0
+
+    def start_turn(self, prompt_tokens: int = 0) -> bool:
+        """
+        prompt_tokens -> size of this turn's prompt, checked against the window
+        True if this turn starts a fresh context (first turn or after a reset).
+        """
+        if self.context is not None and len(self.context) + prompt_tokens > self.max_context_tokens:
+            self.context = None
+            self.resets += 1
+        return self.context is None
+
+    def stream(self, prompt: str, **fields):
+        """Yields answer tokens; afterwards the new context and this turn's stats are stored."""
+        fresh = self.context is None
+        if fresh:
+            fields["system"] = self.system
+        else:
+            fields["context"] = self.context
+
+        final = {}
+        yield from self.client.generate_stream(prompt, model=self.model, final=final, **fields)
+
+        self.context = final.get("context")
+        self.turns.append({
+            "turn": len(self.turns) + 1,
+            "fresh_context": fresh,
+            "prompt_eval_count": final.get("prompt_eval_count", 0),
+            "prompt_eval_ms": final.get("prompt_eval_duration", 0) / 1e6,
+            "eval_count": final.get("eval_count", 0),
+            "context_tokens": len(self.context or []),
+        })
+
+    def reset(self):
+        self.context = None
+
+    def last_turn(self) -> dict:
+        return self.turns[-1] if self.turns else {}
+
+    def stats(self) -> dict:
+        evaluated = [t["prompt_eval_count"] for t in self.turns]
+        return {
+            "turns": len(self.turns),
+            "resets": self.resets,
+            "prompt_eval_tokens": sum(evaluated),
+            "prompt_eval_per_turn": evaluated,
+        }
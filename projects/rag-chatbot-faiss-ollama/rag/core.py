@@ -0,0 +1,72 @@
+# rag/core.py
+
+"""
+Core RAG helpers
+
+The same load -> chunk -> embed -> index steps used by the numbered scripts,
+collected in one place so the shared modules in this package can reuse them.
+"""
+
+from pathlib import Path
+import numpy as np
+import faiss
+
+from .chunking import split_spans
+from .mmr import mmr_search
+
+
+DEFAULT_EMBED_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_CHUNK_OVERLAP = 40
+
+
+def load_text_file(file_path: str) -> str:
+    return Path(file_path).read_text(encoding="utf-8")
+
+
+def chunk_text(text: str, chunk_size=DEFAULT_CHUNK_SIZE, chunk_overlap=DEFAULT_CHUNK_OVERLAP):
+    # same chunks as LangChain's RecursiveCharacterTextSplitter, split by offsets (rag.chunking)
+    return split_spans(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap).to_list()
+
+
+def embed_texts(model, texts, batch_size: int = 32):
+    """
+    model can be a SentenceTransformer or anything with the same encode()
+    signature (e.g. rag.parallel_embed.ParallelEmbedder for multi-process).
+    """
+    embeddings = model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True
+    )
+    return embeddings.astype("float32")
+
+
+def build_faiss_index(embeddings: np.ndarray):
+    dim = embeddings.shape[1]
+    index = faiss.IndexFlatIP(dim)  # inner product == cosine for normalized vectors
+    index.add(embeddings)
+    return index
+
+
+def retrieve_batch(index, model, queries: list[str], chunks, k: int = 3, mmr_lambda: float = None):
+    """
+    Retrieve for many queries at once: one model.encode over all queries and
+    one index.search over the query matrix.
+    Returns one [(chunk_id, score, chunk_text), ...] list per query, best
+    first, so results for any smaller k are just results[:k].
+    mmr_lambda -> re-select from the top candidates with MMR (rag.mmr) for
+                  diversity; slices stay valid since MMR picks greedily.
+    """
+    if not queries:
+        return []
+    query_embeddings = embed_texts(model, list(queries))
+    if mmr_lambda is None:
+        scores, ids = index.search(query_embeddings, k)
+    else:
+        scores, ids = mmr_search(index, query_embeddings, k, lambda_mult=mmr_lambda)
+    return [
+        [(int(idx), float(score), chunks[int(idx)]) for idx, score in zip(row_ids, row_scores) if idx != -1]
+        for row_ids, row_scores in zip(ids, scores)
+    ]
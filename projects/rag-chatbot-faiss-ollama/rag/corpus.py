@@ -0,0 +1,309 @@
+# rag/corpus.py
+
+"""
+Multi-Document Corpus
+
+Chunks a file or a whole directory and keeps per-chunk metadata in a
+columnar side table (one numpy array per field, row = chunk id):
+
+- source_id            -> index into `sources` (file path)
+- section_id           -> index into `sections` (nearest markdown heading)
+- byte_start, byte_end -> UTF-8 byte range of the chunk in its file
+- line_start, line_end -> 1-based line range (for citations)
+- tag_bits             -> uint64 bitmap over `tags` (max 64 tags)
+
+Filters ("only docs tagged X", "only files under docs/api/") become a
+boolean mask over chunk ids, which FAISS applies during the search through
+an IDSelectorBitmap, so a filtered search scans the same vectors as an
+unfiltered one instead of over-fetching and post-filtering.
+
+Persisted next to the FAISS index as metadata.npz + metadata.json.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+from .ann import search
+from .chunking import split_spans
+from .core import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, DEFAULT_EMBED_MODEL, build_faiss_index, embed_texts
+from .embed_cache import DEFAULT_CACHE_PATH, CachedEmbedder, EmbeddingCache
+from .index_store import MANIFEST_FILE, MANIFEST_VERSION, file_sha256, load_index, save_index
+from .ingest import DEFAULT_PATTERNS, iter_files
+
+
+DEFAULT_CORPUS_STORE_DIR = ".rag_index_corpus"
+TABLE_FILE = "metadata.npz"
+TABLE_LABELS_FILE = "metadata.json"
+MAX_TAGS = 64
+
+HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+
+
+def chunk_with_offsets(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_overlap: int = DEFAULT_CHUNK_OVERLAP):
+    """[(start_char, chunk), ...] with the same splitter as rag.core.chunk_text (exact offsets)."""
+    spans = split_spans(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return list(zip(spans.starts.tolist(), spans))
+
+
+def list_sources(source: str, patterns=DEFAULT_PATTERNS) -> list[Path]:
+    """A single file, or every matching file under a directory."""
+    path = Path(source)
+    return [path] if path.is_file() else list(iter_files(path, patterns))
+
+
+def folder_tags(path: Path, root: Path) -> list[str]:
+    """Default tags: the folder names between root and the file (docs/api/x.md -> ["api"])."""
+    try:
+        return list(path.relative_to(root).parent.parts)
+    except ValueError:
+        return []
+
+
+class ChunkTable:
+    """Columnar per-chunk metadata, row i describes chunk id i."""
+
+    COLUMNS = {
+        "source_id": "int32",
+        "section_id": "int32",
+        "byte_start": "int64",
+        "byte_end": "int64",
+        "line_start": "int32",
+        "line_end": "int32",
+        "tag_bits": "uint64",
+    }
+
+    def __init__(self, columns: dict, sources: list[str], sections: list[str], tags: list[str]):
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.asarray(columns[name], dtype=dtype))
+        self.sources = sources
+        self.sections = sections
+        self.tags = tags
+        self._masks = {}
+
+    def __len__(self) -> int:
+        return len(self.source_id)
+
+    def row(self, chunk_id: int) -> dict:
+        bits = int(self.tag_bits[chunk_id])
+        return {
+            "source": self.sources[self.source_id[chunk_id]],
+            "section": self.sections[self.section_id[chunk_id]],
+            "byte_start": int(self.byte_start[chunk_id]),
+            "byte_end": int(self.byte_end[chunk_id]),
+            "line_start": int(self.line_start[chunk_id]),
+            "line_end": int(self.line_end[chunk_id]),
+            "tags": [tag for bit, tag in enumerate(self.tags) if bits >> bit & 1],
+        }
+
+    def citation(self, chunk_id: int) -> str:
+        """e.g. 'docs/api/errors.md:12-18 § Error codes'"""
+        row = self.row(chunk_id)
+        lines = f"{row['line_start']}" if row["line_start"] == row["line_end"] else f"{row['line_start']}-{row['line_end']}"
+        section = f" § {row['section']}" if row["section"] else ""
+        return f"{row['source']}:{lines}{section}"
+
+    def block_citation(self, chunk_ids) -> str:
+        """citation() for a packed block of neighbouring chunks of one file (rag.packing)."""
+        first = self.row(chunk_ids[0])
+        line_start = min(int(self.line_start[i]) for i in chunk_ids)
+        line_end = max(int(self.line_end[i]) for i in chunk_ids)
+        lines = f"{line_start}" if line_start == line_end else f"{line_start}-{line_end}"
+        section = f" § {first['section']}" if first["section"] else ""
+        return f"{first['source']}:{lines}{section}"
+
+    # -------------------------
+    # Filters
+    # -------------------------
+    def mask(self, tags=None, source_prefix: str = None):
+        """
+        Boolean mask over chunk ids (None = no filter): chunks having any of
+        `tags` and whose source path starts with `source_prefix`.
+        Masks are cached per filter, so repeated filters cost nothing.
+        """
+        tags = tuple(sorted(tags)) if tags else ()
+        if not tags and not source_prefix:
+            return None
+        key = (tags, source_prefix)
+        if key not in self._masks:
+            mask = np.ones(len(self), dtype=bool)
+            if tags:
+                wanted = sum(1 << self.tags.index(tag) for tag in tags if tag in self.tags)
+                mask &= (self.tag_bits & np.uint64(wanted)) != 0
+            if source_prefix:
+                matching = [i for i, source in enumerate(self.sources) if source.startswith(source_prefix)]
+                mask &= np.isin(self.source_id, matching)
+            self._masks[key] = mask
+        return self._masks[key]
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def save(self, store_dir: str):
+        store = Path(store_dir)
+        store.mkdir(parents=True, exist_ok=True)
+
+        tmp = store / (TABLE_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **{name: getattr(self, name) for name in self.COLUMNS})
+        os.replace(tmp, store / TABLE_FILE)
+
+        labels = {"sources": self.sources, "sections": self.sections, "tags": self.tags}
+        tmp = store / (TABLE_LABELS_FILE + ".tmp")
+        tmp.write_text(json.dumps(labels, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, store / TABLE_LABELS_FILE)
+
+    @classmethod
+    def load(cls, store_dir: str):
+        """The persisted table, or None if missing / unreadable."""
+        store = Path(store_dir)
+        try:
+            labels = json.loads((store / TABLE_LABELS_FILE).read_text(encoding="utf-8"))
+            with np.load(store / TABLE_FILE) as data:
+                columns = {name: data[name] for name in cls.COLUMNS}
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(columns, labels["sources"], labels["sections"], labels["tags"])
+
+
+def build_corpus(
+    source: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    patterns=DEFAULT_PATTERNS,
+    extra_tags: dict = None,
+):
+    """
+    Chunk a file or directory. Returns (chunks, ChunkTable).
+    extra_tags: {source path: [tags]} added on top of the folder tags.
+    """
+    root = Path(source) if Path(source).is_dir() else Path(source).parent
+    chunks = []
+    columns = {name: [] for name in ChunkTable.COLUMNS}
+    sources, sections, tags = [], [""], []
+    section_ids = {"": 0}
+    tag_ids = {}
+
+    for source_id, path in enumerate(list_sources(source, patterns)):
+        text = path.read_text(encoding="utf-8")
+        source_name = path.as_posix()
+        sources.append(source_name)
+
+        file_tags = folder_tags(path, root) + list((extra_tags or {}).get(source_name, []))
+        bits = 0
+        for tag in file_tags:
+            if tag not in tag_ids:
+                if len(tag_ids) == MAX_TAGS:
+                    raise ValueError(f"More than {MAX_TAGS} distinct tags")
+                tag_ids[tag] = len(tag_ids)
+                tags.append(tag)
+            bits |= 1 << tag_ids[tag]
+
+        headings = [(m.start(), m.group(1)) for m in HEADING_RE.finditer(text)] if path.suffix == ".md" else []
+        heading_starts = [start for start, _ in headings]
+
+        # walk chunks in order, converting char offsets to bytes / lines incrementally
+        char_pos = byte_pos = 0
+        line = 1
+        for start, chunk in chunk_with_offsets(text, chunk_size, chunk_overlap):
+            byte_pos += len(text[char_pos:start].encode("utf-8"))
+            line += text.count("\n", char_pos, start)
+            char_pos = start
+
+            h = bisect.bisect_right(heading_starts, start) - 1
+            section = headings[h][1] if h >= 0 else ""
+            if section not in section_ids:
+                section_ids[section] = len(sections)
+                sections.append(section)
+
+            chunks.append(chunk)
+            columns["source_id"].append(source_id)
+            columns["section_id"].append(section_ids[section])
+            columns["byte_start"].append(byte_pos)
+            columns["byte_end"].append(byte_pos + len(chunk.encode("utf-8")))
+            columns["line_start"].append(line)
+            columns["line_end"].append(line + chunk.count("\n"))
+            columns["tag_bits"].append(bits)
+
+    return chunks, ChunkTable(columns, sources, sections, tags)
+
+
+# -------------------------
+# Filtered search
+# -------------------------
+def filtered_search(index, query_embeddings: np.ndarray, k: int = 3, mask: np.ndarray = None):
+    """index.search restricted to the ids where mask is True (no mask = plain search)."""
+    if mask is None:
+        return index.search(query_embeddings, k)
+    return search(index, query_embeddings, k, mask=mask)
+
+
+# -------------------------
+# Persisted corpus index
+# -------------------------
+def corpus_manifest(paths: list[Path], model_name: str, chunk_size: int, chunk_overlap: int, source: str) -> dict:
+    """Like rag.index_store.build_manifest, with one hash over every file (path + content)."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(path.as_posix().encode("utf-8"))
+        h.update(file_sha256(path).encode("ascii"))
+    return {
+        "version": MANIFEST_VERSION,
+        "source_path": str(source),
+        "source_sha256": h.hexdigest(),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "model_name": model_name,
+        "normalize_embeddings": True,
+        "index_type": "flat",
+        "storage": "memory",
+        "corpus": True,
+        "offsets": "spans",  # exact chunk offsets (rag.chunking); older corpora are rebuilt
+    }
+
+
+def load_or_build_corpus(
+    source: str,
+    model,
+    model_name: str = DEFAULT_EMBED_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    store_dir: str = DEFAULT_CORPUS_STORE_DIR,
+    patterns=DEFAULT_PATTERNS,
+    cache_path: str = DEFAULT_CACHE_PATH,
+):
+    """
+    (index, chunks, ChunkTable) for a file or directory, rebuilt only when a
+    file, the chunker or the model changed.
+    """
+    expected = corpus_manifest(list_sources(source, patterns), model_name, chunk_size, chunk_overlap, source)
+
+    loaded = load_index(store_dir, expected)
+    table = ChunkTable.load(store_dir) if loaded is not None else None
+    if table is not None and len(table) == len(loaded[1]):
+        index, chunks = loaded
+        print(f"✅ Loaded persisted corpus from {store_dir} ({len(table.sources)} files, {index.ntotal} chunks)")
+        return index, chunks, table
+
+    print(f"🔧 No matching corpus in {store_dir}, building from {source}...")
+    chunks, table = build_corpus(source, chunk_size, chunk_overlap, patterns)
+    if cache_path:
+        cache = EmbeddingCache(cache_path)
+        embeddings = embed_texts(CachedEmbedder(model, cache, model_name), chunks)
+        cache.close()
+    else:
+        embeddings = embed_texts(model, chunks)
+    index = build_faiss_index(embeddings)
+
+    # drop the old manifest before touching the table: save_index writes the
+    # new manifest last, which marks the store complete again
+    (Path(store_dir) / MANIFEST_FILE).unlink(missing_ok=True)
+    table.save(store_dir)
+    save_index(store_dir, index, chunks, expected)
+    print(f"✅ Built and saved corpus to {store_dir} ({len(table.sources)} files, {index.ntotal} chunks)")
+    return index, chunks, table
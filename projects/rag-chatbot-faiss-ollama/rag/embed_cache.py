@@ -0,0 +1,140 @@
+# rag/embed_cache.py
+
+"""
+Embedding Cache
+
+Content-addressed, on-disk cache of embeddings in a local SQLite file.
+
+Key: (model name, normalize flag, sha256 of the text)
+Value: the float32 vector bytes
+
+Lookups are batched, so embedding N texts costs one SELECT per ~500 texts
+and only the cache misses are sent to model.encode. Re-running the eval or
+rebuilding an index after a small edit then costs almost nothing.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .core import DEFAULT_EMBED_MODEL
+
+
+DEFAULT_CACHE_PATH = ".rag_cache/embeddings.sqlite"
+LOOKUP_BATCH = 500  # stays under SQLite's host-parameter limit
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """SQLite-backed store of (model, normalize, text sha256) -> vector."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                normalize INTEGER NOT NULL,
+                text_sha256 BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, normalize, text_sha256)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model_name: str, normalize: bool, keys: list[bytes]) -> dict:
+        """key -> float32 vector, for the keys that are cached."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_sha256, vector FROM embeddings "
+                    f"WHERE model = ? AND normalize = ? AND text_sha256 IN ({placeholders})",
+                    (model_name, int(normalize), *batch),
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype="float32")
+        return found
+
+    def put_many(self, model_name: str, normalize: bool, keys: list[bytes], vectors: np.ndarray):
+        rows = [
+            (model_name, int(normalize), key, np.ascontiguousarray(vector, dtype="float32").tobytes())
+            for key, vector in zip(keys, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def embed(self, model, texts: list[str], model_name: str, normalize: bool = True, batch_size: int = 32) -> np.ndarray:
+        """Embeddings for texts, calling model.encode only for cache misses."""
+        keys = [text_key(t) for t in texts]
+        cached = self.get_many(model_name, normalize, list(set(keys)))
+
+        # unique misses, in first-seen order
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        # a hit is any text served without a model call (incl. in-batch repeats)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = model.encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=normalize,
+            ).astype("float32")
+            self.put_many(model_name, normalize, list(missing), new_vectors)
+            cached.update(zip(missing, new_vectors))
+
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        return np.stack([cached[key] for key in keys]).astype("float32", copy=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedEmbedder:
+    """
+    Wraps a model so its encode() goes through an EmbeddingCache.
+    Same encode() signature as SentenceTransformer, so it can be passed to
+    embed_texts / load_or_build_index / ingest_directory as the model.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache = None, model_name: str = DEFAULT_EMBED_MODEL):
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+        self.model_name = model_name
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size=batch_size, normalize_embeddings=normalize_embeddings)[0]
+        return self.cache.embed(
+            self.model, list(texts), self.model_name, normalize=normalize_embeddings, batch_size=batch_size
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
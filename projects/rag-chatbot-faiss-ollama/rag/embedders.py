@@ -0,0 +1,226 @@
+# rag/embedders.py
+
+"""
+Embedding Backends
+
+Every backend has the SentenceTransformer-style interface the rest of the
+package already relies on (encode(...) + get_sentence_embedding_dimension()),
+plus a `name` used as the embedding-cache / manifest key, so switching
+backends never mixes vectors from different models in one index.
+
+- "sentence-transformers" -> the PyTorch model (reference)
+- "onnx"                  -> ONNX Runtime, fp32 export of the same local model
+- "onnx-int8"             -> ONNX Runtime, dynamic int8 quantization of that export
+- "hashing"               -> deterministic hashed bag-of-words, no model (tests / benchmarks)
+
+The ONNX export reproduces the all-MiniLM-L6-v2 pipeline (transformer ->
+mean pooling -> optional L2 normalize) and is written once to
+.rag_models/<model>/; check it against the reference with `parity(...)`.
+"""
+
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from .core import DEFAULT_EMBED_MODEL
+
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8", "hashing")
+DEFAULT_BACKEND = os.getenv("RAG_EMBED_BACKEND", "sentence-transformers")
+DEFAULT_EXPORT_DIR = ".rag_models"
+
+
+def _l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+class EmbeddingBackend(ABC):
+    """Base class: subclasses implement _embed(texts, batch_size) -> float32 (n, dim)."""
+
+    name = "base"
+    dim = 0
+
+    @abstractmethod
+    def _embed(self, texts: list[str], batch_size: int) -> np.ndarray:
+        ...
+
+    def encode(self, texts, batch_size: int = 32, convert_to_numpy: bool = True, normalize_embeddings: bool = False, **kwargs):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size=batch_size, normalize_embeddings=normalize_embeddings)[0]
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dim), dtype="float32")
+        embeddings = self._embed(texts, batch_size).astype("float32", copy=False)
+        return _l2_normalize(embeddings) if normalize_embeddings else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    def __init__(self, model_name: str = DEFAULT_EMBED_MODEL, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.name = model_name  # same key as before backends existed: caches stay valid
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def _embed(self, texts, batch_size):
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    quantize   -> "fp32" or "int8" (dynamic, weights int8 / activations quantized at runtime)
+    num_threads -> ONNX Runtime intra-op threads (None = all cores)
+    max_length -> tokens per text (the model was trained with 256)
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBED_MODEL,
+        quantize: str = "fp32",
+        export_dir: str = DEFAULT_EXPORT_DIR,
+        num_threads: int = None,
+        max_length: int = 256,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        if quantize not in ("fp32", "int8"):
+            raise ValueError(f"Unknown quantize={quantize!r}, expected 'fp32' or 'int8'")
+
+        model_dir = Path(export_dir) / model_name.replace("/", "__")
+        onnx_path = export_onnx(model_name, model_dir)
+        if quantize == "int8":
+            onnx_path = quantize_onnx_int8(onnx_path, model_dir / "model.int8.onnx")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.max_length = max_length
+
+        self.name = f"{model_name}@onnx-{quantize}"
+        self.dim = self.session.get_outputs()[0].shape[-1]
+
+    def _embed(self, texts, batch_size):
+        out = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {name: tokens[name].astype("int64") for name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            # mean pooling over real (non-padding) tokens, as in the sentence-transformers model
+            mask = tokens["attention_mask"][..., None].astype("float32")
+            out.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        return np.concatenate(out, axis=0)
+
+
+def export_onnx(model_name: str, model_dir: Path) -> Path:
+    """Export the local model's transformer to model_dir/model.onnx (once) + its tokenizer."""
+    onnx_path = model_dir / "model.onnx"
+    if onnx_path.exists():
+        return onnx_path
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    st_model.tokenizer.save_pretrained(str(model_dir))
+
+    dummy = st_model.tokenizer(["export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic = {name: {0: "batch", 1: "tokens"} for name in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "tokens"}
+
+    tmp = model_dir / "model.onnx.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(dummy[name] for name in input_names),
+            str(tmp),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+    os.replace(tmp, onnx_path)
+    return onnx_path
+
+
+def quantize_onnx_int8(onnx_path: Path, int8_path: Path) -> Path:
+    if not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        tmp = int8_path.with_suffix(".tmp")
+        quantize_dynamic(str(onnx_path), str(tmp), weight_type=QuantType.QInt8)
+        os.replace(tmp, int8_path)
+    return int8_path
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Deterministic stand-in: each lowercase word is hashed into `dim` signed
+    buckets. Same text -> same vector in every process, shared words ->
+    positive cosine. No model download, thousands of times faster.
+    """
+
+    TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, texts, batch_size):
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in self.TOKEN_RE.findall(text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        return out
+
+
+def load_backend(backend: str = DEFAULT_BACKEND, model_name: str = DEFAULT_EMBED_MODEL, **kwargs) -> EmbeddingBackend:
+    """backend is one of BACKENDS (default: $RAG_EMBED_BACKEND or sentence-transformers)."""
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend(model_name, **kwargs)
+    if backend == "onnx":
+        return OnnxBackend(model_name, quantize="fp32", **kwargs)
+    if backend == "onnx-int8":
+        return OnnxBackend(model_name, quantize="int8", **kwargs)
+    if backend == "hashing":
+        return HashingBackend(**kwargs)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}")
+
+
+def parity(reference, candidate, texts: list[str], batch_size: int = 32) -> dict:
+    """
+    Cosine agreement between two backends on the same texts (1.0 = identical
+    directions). int8 typically lands around 0.99 mean cosine.
+    """
+    a = reference.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    b = candidate.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    cosines = np.sum(a * b, axis=1)
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "p5_cosine": float(np.percentile(cosines, 5)),
+    }
@@ -0,0 +1,106 @@
+# rag/evaluation.py
+
+"""
+Retrieval Evaluation Metrics
+
+Eval items are {"id", "question", "gold_contains"}; a chunk is relevant to a
+question if it contains the gold phrase (case-insensitive). The ranked chunk
+ids of every question are scored with:
+
+- hit@k     -> at least one relevant chunk in the top k (old "precision@k")
+- recall@k  -> share of all relevant chunks found in the top k
+- MRR       -> 1 / rank of the first relevant chunk (0 if none retrieved)
+- nDCG@k    -> binary-gain DCG normalized by the ideal ranking
+
+Quality comes from one batched retrieval for all questions
+(evaluate_retrieval). Latency is a separate serial loop of single-query
+calls (time_retrieval), so batching doesn't hide per-query cost and the
+timings can be taken away from other work. Everything is returned as plain
+dicts so it can be dumped straight into a JSON report.
+"""
+
+import math
+import time
+
+import numpy as np
+
+
+def relevant_ids(chunks, gold_phrase: str) -> set:
+    gold = gold_phrase.lower()
+    return {i for i, chunk in enumerate(chunks) if gold in chunk.lower()}
+
+
+def latency_summary(latencies_ms) -> dict:
+    if not len(latencies_ms):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0}
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(np.mean(latencies_ms))}
+
+
+def ndcg_at_k(ranked_ids, relevant: set, k: int) -> float:
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, idx in enumerate(ranked_ids[:k], start=1) if idx in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def reciprocal_rank(ranked_ids, relevant: set) -> float:
+    for rank, idx in enumerate(ranked_ids, start=1):
+        if idx in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def score_rankings(eval_items, rankings, chunks, ks=(1, 3, 5)) -> dict:
+    """
+    rankings: one list of ranked chunk ids (best first, -1 ignored) per item.
+    Questions whose gold phrase is in no chunk can't be scored; they are
+    counted as "unanswerable" and listed, not averaged in.
+    """
+    sums = {f"{name}@{k}": 0.0 for k in ks for name in ("hit", "recall", "ndcg")}
+    sums["mrr"] = 0.0
+    missed = {k: [] for k in ks}
+    unanswerable = []
+
+    for item, ranked in zip(eval_items, rankings):
+        ranked = [int(idx) for idx in ranked if idx != -1]
+        relevant = relevant_ids(chunks, item["gold_contains"])
+        if not relevant:
+            unanswerable.append(item["id"])
+            continue
+
+        for k in ks:
+            found = len(relevant.intersection(ranked[:k]))
+            sums[f"hit@{k}"] += 1.0 if found else 0.0
+            sums[f"recall@{k}"] += found / len(relevant)
+            sums[f"ndcg@{k}"] += ndcg_at_k(ranked, relevant, k)
+            if not found:
+                missed[k].append(item["id"])
+        sums["mrr"] += reciprocal_rank(ranked, relevant)
+
+    scored = len(eval_items) - len(unanswerable)
+    metrics = {name: total / scored if scored else 0.0 for name, total in sums.items()}
+    return {
+        "questions": len(eval_items),
+        "unanswerable": unanswerable,
+        "metrics": metrics,
+        "missed": {f"@{k}": ids for k, ids in missed.items()},
+    }
+
+
+def evaluate_retrieval(eval_items, retrieve_batch, chunks, ks=(1, 3, 5)) -> dict:
+    """
+    retrieve_batch(questions, k) -> one ranked id list per question; called
+    once for all questions with k = max(ks) (smaller k are prefixes).
+    """
+    rankings = retrieve_batch([item["question"] for item in eval_items], max(ks))
+    return score_rankings(eval_items, rankings, chunks, ks)
+
+
+def time_retrieval(eval_items, retrieve, k: int) -> dict:
+    """retrieve(question, k) timed once per question, one after another -> latency_summary."""
+    latencies_ms = []
+    for item in eval_items:
+        start = time.perf_counter()
+        retrieve(item["question"], k)
+        latencies_ms.append((time.perf_counter() - start) * 1000.0)
+    return latency_summary(latencies_ms)
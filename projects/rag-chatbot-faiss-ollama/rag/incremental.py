@@ -0,0 +1,239 @@
+# rag/incremental.py
+
+"""
+Incremental Index
+
+A FAISS index that can add, update and delete single documents without
+re-embedding the whole corpus.
+
+- Vectors live in an IndexIDMap2, so each vector carries its own 64-bit id
+- Chunk ids are stable: derived from (document id, chunk position)
+- Each document remembers its content hash; unchanged documents are skipped
+- `version` is bumped on every add / remove, so caches keyed on it go stale
+
+Nightly re-ingestion therefore only embeds the documents whose hash changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from .core import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_EMBED_MODEL,
+    chunk_text,
+    embed_texts,
+)
+
+
+INDEX_FILE = "index.faiss"
+STATE_FILE = "state.json"
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id_for(doc_id: str, position: int) -> int:
+    """Stable, positive 63-bit id for the chunk at `position` in `doc_id`."""
+    digest = hashlib.blake2b(f"{doc_id}\x00{position}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+class IncrementalIndex:
+    """
+    Document-aware FAISS index.
+
+    docs:    doc_id -> {"sha256": ..., "chunk_ids": [...]}
+    chunks:  chunk_id -> chunk text
+    version: bumped on every add / remove of vectors (saved with the index)
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        model_name: str = DEFAULT_EMBED_MODEL,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    ):
+        self.dim = dim
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        self.docs: dict[str, dict] = {}
+        self.chunks: dict[int, str] = {}
+        self.version = 0
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    # -------------------------
+    # Single-document updates
+    # -------------------------
+    def upsert_document(self, doc_id: str, text: str, model) -> int:
+        """
+        Add or replace one document. Returns how many chunks were embedded
+        (0 when the document is unchanged).
+        """
+        sha = text_sha256(text)
+        existing = self.docs.get(doc_id)
+        if existing and existing["sha256"] == sha:
+            return 0
+
+        if existing:
+            self._remove_chunks(existing["chunk_ids"])
+
+        doc_chunks = chunk_text(text, chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        ids = [chunk_id_for(doc_id, pos) for pos in range(len(doc_chunks))]
+
+        if doc_chunks:
+            embeddings = embed_texts(model, doc_chunks)
+            self.index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+            self.chunks.update(zip(ids, doc_chunks))
+            self.version += 1
+
+        self.docs[doc_id] = {"sha256": sha, "chunk_ids": ids}
+        return len(doc_chunks)
+
+    def delete_document(self, doc_id: str) -> bool:
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self._remove_chunks(doc["chunk_ids"])
+        return True
+
+    def _remove_chunks(self, ids: list[int]):
+        if not ids:
+            return
+        self.index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype="int64")))
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+        self.version += 1
+
+    # -------------------------
+    # Whole-corpus sync
+    # -------------------------
+    def sync(self, documents: dict[str, str], model) -> dict:
+        """
+        Make the index match `documents` (doc_id -> text): add new docs,
+        re-embed changed ones, delete the ones that disappeared.
+        """
+        stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "chunks_embedded": 0}
+
+        for doc_id in list(self.docs):
+            if doc_id not in documents:
+                self.delete_document(doc_id)
+                stats["deleted"] += 1
+
+        for doc_id, text in documents.items():
+            existing = self.docs.get(doc_id)
+            if existing is None:
+                stats["added"] += 1
+            elif existing["sha256"] == text_sha256(text):
+                stats["unchanged"] += 1
+                continue
+            else:
+                stats["updated"] += 1
+            stats["chunks_embedded"] += self.upsert_document(doc_id, text, model)
+
+        return stats
+
+    # -------------------------
+    # Search
+    # -------------------------
+    def search(self, query_embeddings: np.ndarray, k: int = 3):
+        k = min(k, self.ntotal)
+        if k == 0:
+            empty = np.empty((len(query_embeddings), 0))
+            return empty.astype("float32"), empty.astype("int64")
+        return self.index.search(query_embeddings, k)
+
+    def retrieve_top_chunks(self, model, query: str, k: int = 3):
+        """Returns [(chunk_id, score, chunk_text), ...] like the app scripts."""
+        scores, ids = self.search(embed_texts(model, [query]), k)
+        return [
+            (int(idx), float(score), self.chunks[int(idx)])
+            for idx, score in zip(ids[0], scores[0])
+            if idx != -1
+        ]
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _params(self) -> dict:
+        return {
+            "dim": self.dim,
+            "model_name": self.model_name,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+    def save(self, store_dir: str):
+        store = Path(store_dir)
+        store.mkdir(parents=True, exist_ok=True)
+
+        faiss.write_index(self.index, str(store / (INDEX_FILE + ".tmp")))
+        os.replace(store / (INDEX_FILE + ".tmp"), store / INDEX_FILE)
+
+        state = {
+            "params": self._params(),
+            "version": self.version,
+            "docs": self.docs,
+            "chunks": {str(chunk_id): text for chunk_id, text in self.chunks.items()},
+        }
+        tmp = store / (STATE_FILE + ".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, store / STATE_FILE)
+
+    @classmethod
+    def load(cls, store_dir: str, **expected_params):
+        """
+        Load a saved index. Returns None when nothing is saved or when any
+        of expected_params (model_name, chunk_size, ...) differs, since then
+        every stored vector is stale anyway.
+        """
+        store = Path(store_dir)
+        if not (store / STATE_FILE).exists() or not (store / INDEX_FILE).exists():
+            return None
+
+        state = json.loads((store / STATE_FILE).read_text(encoding="utf-8"))
+        params = state["params"]
+        if any(params.get(key) != value for key, value in expected_params.items()):
+            return None
+
+        inc = cls(**params)
+        inc.index = faiss.read_index(str(store / INDEX_FILE))
+        inc.docs = state["docs"]
+        inc.version = state.get("version", 0)
+        inc.chunks = {int(chunk_id): text for chunk_id, text in state["chunks"].items()}
+        return inc
+
+    @classmethod
+    def open(
+        cls,
+        store_dir: str,
+        dim: int,
+        model_name: str = DEFAULT_EMBED_MODEL,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    ):
+        """Load the saved index if its params match, else start an empty one."""
+        params = dict(dim=dim, model_name=model_name, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        return cls.load(store_dir, **params) or cls(**params)
+
+
+def read_documents(docs_dir: str, pattern: str = "*.txt") -> dict[str, str]:
+    """doc_id (path relative to docs_dir) -> file text."""
+    root = Path(docs_dir)
+    return {
+        path.relative_to(root).as_posix(): path.read_text(encoding="utf-8")
+        for path in sorted(root.rglob(pattern))
+        if path.is_file()
+    }
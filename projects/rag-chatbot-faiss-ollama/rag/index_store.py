@@ -0,0 +1,217 @@
+# rag/index_store.py
+
+"""
+Persistent Index Store
+
+Saves the FAISS index, the chunk texts and a manifest to a directory so the
+apps can skip re-chunking and re-embedding on every start.
+
+Layout of the store directory:
+- index.faiss    -> the FAISS index (faiss.write_index)
+- chunks.json    -> list of chunk strings, same order as the index ids
+- bm25.npz + bm25_vocab.json -> BM25 inverted index over the same chunk ids
+- manifest.json  -> what the artifact was built from
+
+With storage="mmap" the chunks and embeddings are written in the
+memory-mapped layout of rag/mmap_store.py instead (embeddings.npy,
+texts.bin, offsets.npy), and a flat index searches embeddings.npy directly,
+so processes share the OS page cache instead of each holding a copy.
+Each storage mode has its own store directory (default_store_dir), so apps
+using different modes never invalidate each other's artifact.
+
+The manifest records the source file hash, the chunker params, the
+embedding model and the FAISS index type. If any of them changed, the
+artifact is stale and we rebuild.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import faiss
+
+from .ann import build_ann_index
+from .embed_cache import DEFAULT_CACHE_PATH, CachedEmbedder, EmbeddingCache
+from .mmap_store import MmapChunkStore, MmapFlatIndex, write_mmap_store
+from .sparse import BM25Index
+from .core import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_EMBED_MODEL,
+    chunk_text,
+    embed_texts,
+    load_text_file,
+)
+
+
+DEFAULT_STORE_DIR = ".rag_index"
+STORAGE_MODES = ("memory", "mmap")
+MANIFEST_VERSION = 1
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"
+MANIFEST_FILE = "manifest.json"
+
+
+def default_store_dir(storage: str = "memory") -> str:
+    """.rag_index for storage="memory", .rag_index/<storage> otherwise."""
+    return DEFAULT_STORE_DIR if storage == "memory" else str(Path(DEFAULT_STORE_DIR) / storage)
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Hash a file in fixed-size blocks (never loads the whole file)."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_manifest(
+    source_path: str,
+    model_name: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    index_type: str = "flat",
+    storage: str = "memory",
+) -> dict:
+    """The fields that decide whether a stored artifact can be reused."""
+    return {
+        "version": MANIFEST_VERSION,
+        "source_path": str(source_path),
+        "source_sha256": file_sha256(source_path),
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "model_name": model_name,
+        "normalize_embeddings": True,
+        "index_type": index_type,
+        "storage": storage,
+    }
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def save_index(store_dir: str, index, chunks: list[str], manifest: dict, embeddings=None):
+    """
+    Write index + chunks first and the manifest last, so a crash mid-save
+    leaves no manifest that points at half-written files.
+    embeddings are required when manifest["storage"] == "mmap".
+    """
+    store = Path(store_dir)
+    store.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = store / MANIFEST_FILE
+    if manifest_path.exists():
+        manifest_path.unlink()
+
+    if manifest.get("storage") == "mmap":
+        write_mmap_store(store_dir, embeddings, chunks)
+        if manifest.get("index_type") != "flat":
+            _write_atomic(store / INDEX_FILE, faiss.serialize_index(index).tobytes())
+    else:
+        _write_atomic(store / INDEX_FILE, faiss.serialize_index(index).tobytes())
+        _write_atomic(store / CHUNKS_FILE, json.dumps(chunks, ensure_ascii=False).encode("utf-8"))
+    BM25Index.build(chunks).save(store_dir)
+
+    full_manifest = dict(manifest, num_chunks=len(chunks), dim=index.d)
+    _write_atomic(manifest_path, json.dumps(full_manifest, indent=2).encode("utf-8"))
+
+
+def read_manifest(store_dir: str):
+    path = Path(store_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def manifest_matches(stored: dict, expected: dict) -> bool:
+    if not stored:
+        return False
+    return all(stored.get(key) == value for key, value in expected.items())
+
+
+def load_index(store_dir: str, expected_manifest: dict):
+    """
+    Returns (index, chunks) if the stored artifact matches expected_manifest,
+    otherwise None.
+    """
+    stored = read_manifest(store_dir)
+    if not manifest_matches(stored, expected_manifest):
+        return None
+
+    store = Path(store_dir)
+    try:
+        if stored.get("storage") == "mmap":
+            chunks = MmapChunkStore(store_dir)
+            if stored.get("index_type") == "flat":
+                index = MmapFlatIndex(chunks.embeddings)
+            else:
+                index = faiss.read_index(str(store / INDEX_FILE))
+        else:
+            index = faiss.read_index(str(store / INDEX_FILE))
+            chunks = json.loads((store / CHUNKS_FILE).read_text(encoding="utf-8"))
+    except (OSError, RuntimeError, ValueError):
+        return None
+
+    if index.ntotal != len(chunks) or len(chunks) != stored.get("num_chunks"):
+        return None
+    return index, chunks
+
+
+def load_or_build_index(
+    source_path: str,
+    model,
+    model_name: str = DEFAULT_EMBED_MODEL,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    store_dir: str = None,
+    index_type: str = "flat",
+    storage: str = "memory",
+    cache_path: str = DEFAULT_CACHE_PATH,
+):
+    """
+    Load the persisted (index, chunks) for source_path, rebuilding only when
+    the manifest no longer matches the source file / chunker / model / index type.
+    index_type is one of rag.ann.INDEX_TYPES, storage one of STORAGE_MODES.
+    store_dir defaults to default_store_dir(storage).
+    A rebuild embeds through the embedding cache at cache_path (None disables
+    it), so only chunks that were never embedded before reach the model.
+    """
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage={storage!r}, expected one of {STORAGE_MODES}")
+    store_dir = store_dir or default_store_dir(storage)
+    expected = build_manifest(source_path, model_name, chunk_size, chunk_overlap, index_type, storage)
+
+    loaded = load_index(store_dir, expected)
+    if loaded is not None:
+        index, chunks = loaded
+        print(f"✅ Loaded persisted index from {store_dir} ({index.ntotal} chunks)")
+        return index, chunks
+
+    print(f"🔧 No matching index in {store_dir}, building from {source_path}...")
+    text = load_text_file(source_path)
+    chunks = chunk_text(text, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if cache_path:
+        cache = EmbeddingCache(cache_path)
+        embeddings = embed_texts(CachedEmbedder(model, cache, model_name), chunks)
+        cache.close()
+        print(f"✅ Embedding cache: {cache.stats()}")
+    else:
+        embeddings = embed_texts(model, chunks)
+    index = build_ann_index(embeddings, index_type)
+
+    save_index(store_dir, index, chunks, expected, embeddings=embeddings)
+    print(f"✅ Built and saved index to {store_dir} ({index.ntotal} chunks)")
+
+    if storage == "mmap":
+        # reopen from disk so the returned objects are the shared, mmapped ones
+        return load_index(store_dir, expected)
+    return index, chunks
@@ -0,0 +1,173 @@
+# rag/ingest.py
+
+"""
+Streaming Ingestion Pipeline
+
+Walks a directory and streams file -> text segments -> chunks -> fixed-size
+batches -> embeddings -> on-disk store (+ optional FAISS index), one batch at
+a time.
+
+- Files are read in segments (never whole), cut at paragraph / line breaks
+- A reader thread fills a bounded queue; when embedding falls behind the
+  reader blocks (backpressure), so at most `queue_size` batches are in RAM
+- Embeddings and texts go straight to an MmapStoreWriter on disk
+- A BM25 inverted index is built over the written store at the end, in
+  blocks spilled to disk (BM25Index.build_on_disk)
+
+Peak memory is therefore ~ batch_size * queue_size chunks (plus the BM25
+vocabulary and one block of postings), not corpus size.
+"""
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+from .core import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, chunk_text, embed_texts
+from .mmap_store import MmapChunkStore, MmapStoreWriter
+from .sparse import BM25Index
+
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+SEGMENT_CHARS = 1 << 20  # ~1M characters read per step
+SEGMENT_BREAKS = ("\n\n", "\n", ". ", " ")
+
+_DONE = object()
+
+
+def iter_files(root: str, patterns=DEFAULT_PATTERNS):
+    """Every file under root matching one of patterns, in a stable order."""
+    root = Path(root)
+    seen = set()
+    for pattern in patterns:
+        for path in sorted(root.rglob(pattern)):
+            if path.is_file() and path not in seen:
+                seen.add(path)
+                yield path
+
+
+def iter_text_segments(path, segment_chars: int = SEGMENT_CHARS):
+    """
+    Read a text file in ~segment_chars pieces, cutting each piece at the
+    last paragraph / line / sentence break so chunks don't straddle segments.
+    A file shorter than segment_chars is one segment, chunked exactly like
+    rag.core.chunk_text on the whole file.
+    """
+    carry = ""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(segment_chars)
+            buffer = carry + block
+            if len(block) < segment_chars:  # EOF: pass the rest through whole
+                if buffer:
+                    yield buffer
+                return
+            cut = -1
+            for sep in SEGMENT_BREAKS:
+                cut = buffer.rfind(sep)
+                if cut > 0:
+                    cut += len(sep)
+                    break
+            if cut <= 0:
+                cut = len(buffer)
+            yield buffer[:cut]
+            carry = buffer[cut:]
+
+
+def iter_chunks(paths, chunk_size: int = DEFAULT_CHUNK_SIZE, chunk_overlap: int = DEFAULT_CHUNK_OVERLAP):
+    """Yields (source_path, chunk_text) for every chunk of every file."""
+    for path in paths:
+        for segment in iter_text_segments(path):
+            for chunk in chunk_text(segment, chunk_size=chunk_size, chunk_overlap=chunk_overlap):
+                yield str(path), chunk
+
+
+def iter_batches(items, batch_size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _produce(batches, out_queue: queue.Queue, errors: list):
+    try:
+        for batch in batches:
+            out_queue.put(batch)  # blocks while the queue is full -> backpressure
+    except Exception as exc:  # surfaced in the consumer thread
+        errors.append(exc)
+    finally:
+        out_queue.put(_DONE)
+
+
+def ingest_directory(
+    root: str,
+    model,
+    store_dir: str,
+    index=None,
+    patterns=DEFAULT_PATTERNS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
+    batch_size: int = 256,
+    queue_size: int = 4,
+    progress_every: float = 5.0,
+) -> dict:
+    """
+    Stream every matching file under root into an mmap store at store_dir
+    (see rag/mmap_store.py). If `index` is given (e.g. a trained IVF-PQ index)
+    each batch is also added to it.
+    """
+    files = list(iter_files(root, patterns))
+    batches = iter_batches(iter_chunks(files, chunk_size, chunk_overlap), batch_size)
+
+    work = queue.Queue(maxsize=queue_size)
+    errors = []
+    reader = threading.Thread(target=_produce, args=(batches, work, errors), daemon=True)
+    reader.start()
+
+    dim = model.get_sentence_embedding_dimension()
+    writer = MmapStoreWriter(store_dir, dim=dim)
+    sources = set()
+
+    start = last_report = time.perf_counter()
+    num_chunks = 0
+    while True:
+        batch = work.get()
+        if batch is _DONE:
+            break
+
+        texts = [chunk for _, chunk in batch]
+        embeddings = embed_texts(model, texts)
+        writer.append(embeddings, texts)
+        if index is not None:
+            index.add(embeddings)
+
+        sources.update(source for source, _ in batch)
+        num_chunks += len(batch)
+
+        now = time.perf_counter()
+        if now - last_report >= progress_every:
+            last_report = now
+            print(
+                f"⏳ {len(sources)}/{len(files)} files | {num_chunks} chunks | "
+                f"{num_chunks / (now - start):.0f} chunks/s | queue {work.qsize()}/{queue_size}"
+            )
+
+    reader.join()
+    writer.close()
+    if errors:
+        raise errors[0]
+
+    # streams the texts back from the mmap store; postings are merged on disk
+    BM25Index.build_on_disk(MmapChunkStore(store_dir), store_dir)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(files),
+        "chunks": num_chunks,
+        "seconds": elapsed,
+        "chunks_per_sec": num_chunks / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,175 @@
+# rag/mmap_store.py
+
+"""
+Memory-Mapped Chunk Store
+
+On-disk layout for corpora that should not be copied into every process:
+
+- embeddings.npy -> (n, dim) float32 matrix, opened with mmap_mode="r"
+- texts.bin      -> all chunk texts, UTF-8, concatenated
+- offsets.npy    -> (n + 1,) int64, chunk i is texts.bin[offsets[i]:offsets[i + 1]]
+
+Nothing is read up front: the OS pages in only the rows and strings that a
+query touches, and several processes (e.g. Streamlit workers) share one
+page-cache copy of the files.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+
+SEARCH_BLOCK_ROWS = 65536
+
+
+def write_mmap_store(store_dir: str, embeddings: np.ndarray, chunks: list[str]):
+    """Write a complete store in one go (embeddings and chunks already in RAM)."""
+    writer = MmapStoreWriter(store_dir, dim=embeddings.shape[1])
+    writer.append(embeddings, chunks)
+    writer.close()
+
+
+class MmapStoreWriter:
+    """
+    Append-only writer, so a store can be filled batch by batch without ever
+    holding the whole corpus in memory. Rows go to a raw part file first and
+    are copied into the final .npy in blocks on close().
+    """
+
+    def __init__(self, store_dir: str, dim: int):
+        self.store = Path(store_dir)
+        self.store.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.count = 0
+        self.text_bytes = 0
+        self.offsets = [0]
+        self._rows = open(self.store / (EMBEDDINGS_FILE + ".part"), "wb")
+        self._texts = open(self.store / (TEXTS_FILE + ".part"), "wb")
+
+    def append(self, embeddings: np.ndarray, chunks: list[str]):
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"{len(embeddings)} embeddings for {len(chunks)} chunks")
+        self._rows.write(np.ascontiguousarray(embeddings, dtype="float32").tobytes())
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            self._texts.write(data)
+            self.text_bytes += len(data)
+            self.offsets.append(self.text_bytes)
+        self.count += len(chunks)
+
+    def close(self):
+        self._rows.close()
+        self._texts.close()
+
+        part = self.store / (EMBEDDINGS_FILE + ".part")
+        rows = np.memmap(part, dtype="float32", mode="r", shape=(self.count, self.dim)) if self.count else None
+        tmp = self.store / (EMBEDDINGS_FILE + ".tmp")
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype="float32", shape=(self.count, self.dim))
+        for start in range(0, self.count, SEARCH_BLOCK_ROWS):
+            out[start:start + SEARCH_BLOCK_ROWS] = rows[start:start + SEARCH_BLOCK_ROWS]
+        out.flush()
+        del out, rows
+        os.replace(tmp, self.store / EMBEDDINGS_FILE)
+        part.unlink()
+
+        os.replace(self.store / (TEXTS_FILE + ".part"), self.store / TEXTS_FILE)
+        with open(self.store / (OFFSETS_FILE + ".tmp"), "wb") as f:
+            np.save(f, np.asarray(self.offsets, dtype="int64"))
+        os.replace(self.store / (OFFSETS_FILE + ".tmp"), self.store / OFFSETS_FILE)
+
+
+class MmapChunkStore:
+    """
+    Read side of the store. Behaves like the `chunks` list used by the
+    scripts (len(), store[i]), but decodes only the strings that are asked for.
+    """
+
+    def __init__(self, store_dir: str):
+        store = Path(store_dir)
+        self.embeddings = np.load(store / EMBEDDINGS_FILE, mmap_mode="r")
+        self.offsets = np.load(store / OFFSETS_FILE, mmap_mode="r")
+        text_size = int(self.offsets[-1])
+        self.texts = (
+            np.memmap(store / TEXTS_FILE, dtype="uint8", mode="r", shape=(text_size,))
+            if text_size else np.empty(0, dtype="uint8")
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.texts[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def rows(self, ids) -> np.ndarray:
+        """Embedding rows for ids, read from disk in sorted order."""
+        ids = np.asarray(ids, dtype="int64")
+        order = np.argsort(ids)
+        out = np.empty((len(ids), self.embeddings.shape[1]), dtype="float32")
+        out[order] = self.embeddings[ids[order]]
+        return out
+
+
+class MmapFlatIndex:
+    """
+    Exact inner-product search directly over the memory-mapped matrix,
+    scanned in blocks so no private copy of the embeddings is made.
+    Same search(q, k) -> (scores, ids) shape as faiss.IndexFlatIP. Filters
+    are a boolean mask (faiss IDSelectors don't apply to it); rag.ann.search
+    routes a mask here.
+    """
+
+    def __init__(self, embeddings: np.ndarray, block_rows: int = SEARCH_BLOCK_ROWS):
+        self.embeddings = embeddings
+        self.block_rows = block_rows
+
+    @property
+    def ntotal(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def d(self) -> int:
+        return self.embeddings.shape[1]
+
+    def search(self, query_embeddings: np.ndarray, k: int = 3, mask: np.ndarray = None):
+        """mask: optional boolean filter over ids; only the selected rows are read and scored."""
+        queries = np.asarray(query_embeddings, dtype="float32")
+        nq = len(queries)
+        best_scores = np.full((nq, k), -np.inf, dtype="float32")
+        best_ids = np.full((nq, k), -1, dtype="int64")
+
+        for start in range(0, self.ntotal, self.block_rows):
+            end = min(start + self.block_rows, self.ntotal)
+            if mask is None:
+                block = np.asarray(self.embeddings[start:end])
+                block_ids = np.arange(start, end)
+            else:
+                block_ids = start + np.flatnonzero(mask[start:end])
+                if len(block_ids) == 0:
+                    continue
+                block = np.asarray(self.embeddings[block_ids])
+            scores = queries @ block.T  # (nq, block)
+
+            # merge this block's candidates with the running top-k
+            all_scores = np.concatenate([best_scores, scores], axis=1)
+            all_ids = np.concatenate([best_ids, np.broadcast_to(block_ids, scores.shape)], axis=1)
+            top = np.argpartition(-all_scores, min(k, all_scores.shape[1] - 1), axis=1)[:, :k]
+            best_scores = np.take_along_axis(all_scores, top, axis=1)
+            best_ids = np.take_along_axis(all_ids, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
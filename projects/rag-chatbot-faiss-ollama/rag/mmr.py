@@ -0,0 +1,102 @@
+# rag/mmr.py
+
+"""
+Maximal Marginal Relevance (MMR)
+
+The raw top-k often holds near-identical chunks from one paragraph, so k=3
+carries one fact three times. MMR re-selects k of the top-N candidates,
+each time taking the one that maximizes
+
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected)
+
+- lambda = 1.0 -> plain relevance order (same as the top-k)
+- lambda = 0.5 -> balanced; lower values favour diversity
+
+All candidate-candidate similarities come from one (N, N) matrix product.
+Each of the k greedy steps is a few vectorized NumPy ops; there is no
+Python loop over candidates.
+"""
+
+import faiss
+import numpy as np
+
+
+DEFAULT_MMR_LAMBDA = 0.5
+DEFAULT_MMR_CANDIDATES = 20
+
+
+def candidate_embeddings(index, ids) -> np.ndarray:
+    """Stored vectors for ids: FAISS reconstruct, or rows of a memory-mapped store."""
+    ids = np.asarray(ids, dtype="int64")
+    if hasattr(index, "embeddings"):  # rag.mmap_store.MmapFlatIndex
+        return np.asarray(index.embeddings[ids], dtype="float32")
+    try:
+        return index.reconstruct_batch(ids)
+    except RuntimeError:
+        # IVF indexes need their id -> inverted list map before reconstructing
+        faiss.extract_index_ivf(index).make_direct_map()
+        return index.reconstruct_batch(ids)
+
+
+def mmr_select(query_embedding: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA) -> np.ndarray:
+    """
+    Positions (into `embeddings`, shape (N, dim), L2-normalized) of the k
+    MMR picks, in pick order. query_embedding: (dim,) or (1, dim).
+    """
+    n = len(embeddings)
+    k = min(k, n)
+    if k == 0:
+        return np.empty(0, dtype="int64")
+
+    relevance = embeddings @ np.asarray(query_embedding, dtype="float32").reshape(-1)
+    similarity = embeddings @ embeddings.T
+
+    picked = np.empty(k, dtype="int64")
+    picked[0] = int(np.argmax(relevance))
+    redundancy = similarity[picked[0]].copy()  # max similarity to anything picked so far
+    available = np.ones(n, dtype=bool)
+    available[picked[0]] = False
+
+    for step in range(1, k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        picked[step] = int(np.argmax(scores))
+        available[picked[step]] = False
+        np.maximum(redundancy, similarity[picked[step]], out=redundancy)
+    return picked
+
+
+def mmr_search(
+    index,
+    query_embeddings: np.ndarray,
+    k: int = 3,
+    lambda_mult: float = DEFAULT_MMR_LAMBDA,
+    candidates: int = DEFAULT_MMR_CANDIDATES,
+):
+    """
+    Drop-in for index.search(query_embeddings, k): one search for the top
+    `candidates` of every query, then MMR per query. Returns (scores, ids)
+    of shape (nq, k), -1 padded; scores stay query similarities, in pick
+    order. Greedy picks are a prefix: the first k' columns are the MMR
+    selection for k'.
+    """
+    query_embeddings = np.asarray(query_embeddings, dtype="float32").reshape(-1, index.d)
+    cand_scores, cand_ids = index.search(query_embeddings, max(candidates, k))
+
+    out_scores = np.full((len(query_embeddings), k), -np.inf, dtype="float32")
+    out_ids = np.full((len(query_embeddings), k), -1, dtype="int64")
+    for row, (query, scores, ids) in enumerate(zip(query_embeddings, cand_scores, cand_ids)):
+        valid = ids != -1
+        scores, ids = scores[valid], ids[valid]
+        picked = mmr_select(query, candidate_embeddings(index, ids), k, lambda_mult)
+        out_scores[row, :len(picked)] = scores[picked]
+        out_ids[row, :len(picked)] = ids[picked]
+    return out_scores, out_ids
+
+
+def mmr_rerank(index, query_embedding: np.ndarray, results, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA):
+    """[(chunk_id, score, text), ...] from any first stage -> k of them in MMR order."""
+    if not results:
+        return []
+    vectors = candidate_embeddings(index, [chunk_id for chunk_id, _, _ in results])
+    return [results[i] for i in mmr_select(query_embedding, vectors, k, lambda_mult)]
@@ -0,0 +1,198 @@
+# rag/ollama_client.py
+
+"""
+Ollama HTTP Client
+
+One shared client for the local Ollama server's /api/generate and /api/chat
+endpoints, replacing `subprocess.run(["ollama", "run", ...])`:
+
+- a pooled requests.Session reuses keep-alive TCP connections
+- no process spawn / CLI startup per answer
+- keep_alive keeps the model loaded between questions ($OLLAMA_KEEP_ALIVE,
+  e.g. "30m" or "-1" to pin it until the server stops)
+- preload() loads the weights without generating (startup warm-up)
+- model options (num_ctx, num_predict, temperature, ...) per client or per call
+- *_stream methods yield tokens from Ollama's NDJSON stream as they arrive
+"""
+
+import json
+import os
+import sys
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_OLLAMA_URL = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+DEFAULT_OLLAMA_MODEL = "llama3.2:3b"
+
+
+def parse_keep_alive(value: str):
+    """Bare numbers (seconds, -1 = forever) are sent as numbers; "30m" / "1h" stay strings."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+DEFAULT_KEEP_ALIVE = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "10m"))
+
+
+class OllamaError(RuntimeError):
+    """Raised when the Ollama server is unreachable or returns an error."""
+
+
+class OllamaClient:
+    """
+    base_url        -> Ollama server (OLLAMA_HOST env var by default)
+    connect_timeout -> seconds to open a connection
+    read_timeout    -> seconds to wait for the answer
+    pool_size       -> max pooled connections (concurrent requests)
+    keep_alive      -> how long Ollama keeps the model loaded after a call
+    options         -> default model options, e.g. {"num_ctx": 4096, "num_predict": 256}
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_OLLAMA_URL,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        pool_size: int = 4,
+        keep_alive: str = DEFAULT_KEEP_ALIVE,
+        options: dict = None,
+    ):
+        if not base_url.startswith(("http://", "https://")):
+            base_url = f"http://{base_url}"
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.options = dict(options or {})
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            # retry only connection setup; never re-send a generation request
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def _payload(self, model: str, options: dict, keep_alive, **fields) -> dict:
+        payload = {"model": model, "stream": False, **fields}
+        merged = {**self.options, **(options or {})}
+        if merged:
+            payload["options"] = merged
+        payload["keep_alive"] = self.keep_alive if keep_alive is None else keep_alive
+        return payload
+
+    def _post(self, path: str, payload: dict) -> dict:
+        try:
+            r = self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+        except requests.RequestException as exc:
+            raise OllamaError(f"Ollama request failed: {exc}") from exc
+        if r.status_code != 200:
+            raise OllamaError(f"Ollama error {r.status_code}: {r.text.strip()}")
+        return r.json()
+
+    def _stream(self, path: str, payload: dict):
+        """Yields each JSON object of Ollama's NDJSON response stream."""
+        payload = dict(payload, stream=True)
+        try:
+            with self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout, stream=True) as r:
+                if r.status_code != 200:
+                    raise OllamaError(f"Ollama error {r.status_code}: {r.text.strip()}")
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise OllamaError(f"Ollama error: {message['error']}")
+                    yield message
+        except requests.RequestException as exc:
+            raise OllamaError(f"Ollama request failed: {exc}") from exc
+
+    # -------------------------
+    # Model residency
+    # -------------------------
+    def preload(self, model: str = DEFAULT_OLLAMA_MODEL, keep_alive=None) -> dict:
+        """
+        /api/generate without a prompt: Ollama loads the weights and returns
+        without generating. Uses the client's default options, since a
+        different num_ctx on the first real call would reload the model.
+        """
+        return self._post("/api/generate", self._payload(model, None, keep_alive))
+
+    def unload(self, model: str = DEFAULT_OLLAMA_MODEL) -> dict:
+        return self._post("/api/generate", self._payload(model, None, 0))
+
+    # -------------------------
+    # /api/generate
+    # -------------------------
+    def generate_response(self, prompt: str, model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, **fields) -> dict:
+        """Full /api/generate JSON (response text, token counts, timings)."""
+        return self._post("/api/generate", self._payload(model, options, keep_alive, prompt=prompt, **fields))
+
+    def generate(self, prompt: str, model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, **fields) -> str:
+        return self.generate_response(prompt, model, options, keep_alive, **fields)["response"].strip()
+
+    def generate_stream(self, prompt: str, model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, final: dict = None, **fields):
+        """
+        Yields response tokens as they are generated. If `final` is given it
+        is filled with the last (done) message: token counts, timings, context.
+        """
+        payload = self._payload(model, options, keep_alive, prompt=prompt, **fields)
+        for message in self._stream("/api/generate", payload):
+            if message.get("done") and final is not None:
+                final.update(message)
+            token = message.get("response", "")
+            if token:
+                yield token
+
+    # -------------------------
+    # /api/chat
+    # -------------------------
+    def chat_response(self, messages: list[dict], model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, **fields) -> dict:
+        return self._post("/api/chat", self._payload(model, options, keep_alive, messages=messages, **fields))
+
+    def chat(self, messages: list[dict], model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, **fields) -> str:
+        return self.chat_response(messages, model, options, keep_alive, **fields)["message"]["content"].strip()
+
+    def chat_stream(self, messages: list[dict], model: str = DEFAULT_OLLAMA_MODEL, options: dict = None, keep_alive=None, final: dict = None, **fields):
+        payload = self._payload(model, options, keep_alive, messages=messages, **fields)
+        for message in self._stream("/api/chat", payload):
+            if message.get("done") and final is not None:
+                final.update(message)
+            token = message.get("message", {}).get("content", "")
+            if token:
+                yield token
+
+    def close(self):
+        self.session.close()
+
+
+def echo_stream(tokens, out=sys.stdout) -> str:
+    """Print tokens as they arrive (terminal apps) and return the full text."""
+    parts = []
+    for token in tokens:
+        out.write(token)
+        out.flush()
+        parts.append(token)
+    out.write("\n")
+    return "".join(parts).strip()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(**kwargs) -> OllamaClient:
+    """Process-wide shared client (kwargs only apply on first call)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient(**kwargs)
+        return _client
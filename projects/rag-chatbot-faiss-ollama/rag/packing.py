@@ -0,0 +1,209 @@
+# rag/packing.py
+
+"""
+Context Packing
+
+Retrieved chunks overlap (chunk_overlap=40) and neighbouring hits repeat
+text, so pasting them verbatim wastes prompt tokens. Each prompt token is
+evaluated by the local model before the first answer token appears.
+
+ContextPacker turns ranked results into a few contiguous blocks:
+
+- adjacent / overlapping chunks of the same source are merged back into
+  one range, so the shared text appears once
+- exact or contained duplicates (the same paragraph in two files) are dropped
+- chunks are taken in score order while the packed context fits in
+  budget_tokens; a chunk that doesn't fit is skipped, a later one
+  (e.g. a neighbour that adds only a few tokens) may still fit
+- blocks are returned best score first
+"""
+
+from .core import DEFAULT_CHUNK_OVERLAP
+
+
+DEFAULT_CONTEXT_TOKENS = 1024
+MIN_TEXT_OVERLAP = 8  # shorter suffix/prefix matches are treated as coincidence
+MAX_GAP_BYTES = 2     # whitespace the splitter stripped between two chunks ("\n\n")
+
+
+def approx_tokens(text: str) -> int:
+    """~4 characters per token for English text with Llama-style tokenizers."""
+    return (len(text) + 3) // 4
+
+
+def text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right` (0 if < MIN_TEXT_OVERLAP)."""
+    for k in range(min(len(left), len(right), max_overlap), MIN_TEXT_OVERLAP - 1, -1):
+        if left[-k:] == right[:k]:
+            return k
+    return 0
+
+
+class _Block:
+    def __init__(self, chunk_id: int, score: float, text: str, source: int, start: int, end: int):
+        self.chunk_ids = [chunk_id]
+        self.score = score
+        self.parts = [text]
+        self.source, self.start, self.end = source, start, end
+
+    def to_dict(self, count_tokens) -> dict:
+        text = "".join(self.parts)
+        return {"chunk_ids": self.chunk_ids, "score": self.score, "text": text, "tokens": count_tokens(text)}
+
+
+class ContextPacker:
+    """
+    budget_tokens -> max tokens over all packed blocks
+    count_tokens  -> text -> tokens (approx_tokens by default; pass a real
+                     tokenizer's counter for exact budgets)
+    table         -> rag.corpus.ChunkTable: chunks merge by their exact byte
+                     ranges per file. Without it, chunk ids are taken to be
+                     consecutive in one source (rag.core.chunk_text order)
+                     and overlaps are found by matching text.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        count_tokens=approx_tokens,
+        table=None,
+        max_overlap: int = DEFAULT_CHUNK_OVERLAP * 2,
+    ):
+        self.budget_tokens = budget_tokens
+        self.count_tokens = count_tokens
+        self.table = table
+        self.max_overlap = max_overlap
+
+        self.packs = 0
+        self.chunks_in = 0
+        self.chunks_packed = 0
+        self.duplicates = 0
+        self.over_budget = 0
+        self.verbatim_tokens = 0
+        self.packed_tokens = 0
+        self.last = {}
+
+    # -------------------------
+    # Merging
+    # -------------------------
+    def _position(self, chunk_id: int):
+        if self.table is None:
+            return 0, chunk_id, chunk_id
+        t = self.table
+        return int(t.source_id[chunk_id]), int(t.byte_start[chunk_id]), int(t.byte_end[chunk_id])
+
+    def _extend(self, block: _Block, chunk_id: int, text: str, start: int, end: int) -> bool:
+        """Append the chunk's new text to block if they are contiguous; False if not."""
+        if self.table is None:
+            if start != block.end + 1:
+                return False
+            k = text_overlap("".join(block.parts)[-self.max_overlap:], text, self.max_overlap)
+            block.parts.append(text[k:] if k else "\n" + text)
+        else:
+            if start > block.end + MAX_GAP_BYTES:
+                return False
+            if end > block.end:
+                if start >= block.end:
+                    block.parts.append("\n" + text)
+                else:
+                    block.parts.append(text.encode("utf-8")[block.end - start:].decode("utf-8"))
+        block.chunk_ids.append(chunk_id)
+        block.end = max(block.end, end)
+        return True
+
+    def _blocks(self, selected) -> list[_Block]:
+        blocks = []
+        for chunk_id, score, text in sorted(selected, key=lambda r: self._position(r[0])):
+            source, start, end = self._position(chunk_id)
+            last = blocks[-1] if blocks else None
+            if last is not None and last.source == source and self._extend(last, chunk_id, text, start, end):
+                last.score = max(last.score, score)
+                continue
+            blocks.append(_Block(chunk_id, score, text, source, start, end))
+        return blocks
+
+    # -------------------------
+    # Packing
+    # -------------------------
+    def pack(self, results, record: bool = True) -> list[dict]:
+        """
+        results: [(chunk_id, score, text), ...] best first (any retriever).
+        Returns [{"chunk_ids", "score", "text", "tokens"}, ...] best first.
+        record=False re-packs without touching last / stats() (e.g. to
+        number the citations of a cached answer).
+        """
+        selected, packed, seen = [], [], []
+        duplicates = over_budget = 0
+
+        for chunk_id, score, text in results:
+            normalized = " ".join(text.split())
+            if any(normalized in other for other in seen):
+                duplicates += 1
+                continue
+
+            trial = [block.to_dict(self.count_tokens) for block in self._blocks(selected + [(chunk_id, score, text)])]
+            if sum(block["tokens"] for block in trial) > self.budget_tokens:
+                over_budget += 1
+                continue
+
+            selected.append((chunk_id, score, text))
+            seen.append(normalized)
+            packed = trial
+
+        packed.sort(key=lambda block: -block["score"])
+
+        if not record:
+            return packed
+
+        verbatim = sum(self.count_tokens(text) for _, _, text in selected)
+        tokens = sum(block["tokens"] for block in packed)
+        self.last = {
+            "chunks": len(results),
+            "packed_chunks": len(selected),
+            "blocks": len(packed),
+            "duplicates": duplicates,
+            "over_budget": over_budget,
+            "verbatim_tokens": verbatim,
+            "tokens": tokens,
+        }
+        self.packs += 1
+        self.chunks_in += len(results)
+        self.chunks_packed += len(selected)
+        self.duplicates += duplicates
+        self.over_budget += over_budget
+        self.verbatim_tokens += verbatim
+        self.packed_tokens += tokens
+        return packed
+
+    def report(self) -> str:
+        """One line about the last pack() call."""
+        last = self.last
+        return (
+            f"🧩 Context: {last['packed_chunks']}/{last['chunks']} chunks -> {last['blocks']} blocks, "
+            f"{last['tokens']} tokens (verbatim {last['verbatim_tokens']}, budget {self.budget_tokens})"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "packs": self.packs,
+            "chunks_in": self.chunks_in,
+            "chunks_packed": self.chunks_packed,
+            "duplicates": self.duplicates,
+            "over_budget": self.over_budget,
+            "tokens_saved": self.verbatim_tokens - self.packed_tokens,
+        }
+
+
+def as_blocks(results, count_tokens=approx_tokens) -> list[dict]:
+    """One unmerged block per result, same shape as ContextPacker.pack()."""
+    return [
+        {"chunk_ids": [chunk_id], "score": score, "text": text, "tokens": count_tokens(text)}
+        for chunk_id, score, text in results
+    ]
+
+
+def format_context(blocks, labels: bool = True) -> str:
+    """Blocks joined for a prompt, as "[Source i] text" (labels=True) or plain."""
+    if labels:
+        return "\n\n".join(f"[Source {i}] {block['text']}" for i, block in enumerate(blocks, start=1))
+    return "\n\n".join(block["text"] for block in blocks)
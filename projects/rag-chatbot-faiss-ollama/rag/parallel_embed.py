@@ -0,0 +1,116 @@
+# rag/parallel_embed.py
+
+"""
+Parallel Embedding
+
+Shards texts across a pool of worker processes, each with its own
+SentenceTransformer copy and a fixed number of torch threads.
+
+ParallelEmbedder has the same encode(...) signature as SentenceTransformer,
+so it can be passed anywhere a model is expected (embed_texts, ingestion).
+Output rows are returned in input order.
+"""
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .core import DEFAULT_EMBED_MODEL
+
+
+# set per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_name: str, torch_threads: int):
+    global _worker_model
+    # each worker owns its cores; tokenizer threads would oversubscribe them
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_shard(args):
+    texts, batch_size, normalize = args
+    embeddings = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=normalize,
+    )
+    return embeddings.astype("float32")
+
+
+class ParallelEmbedder:
+    """
+    Process pool of embedding workers.
+
+    num_workers   -> processes (default: one per core / torch_threads)
+    torch_threads -> intra-op threads per worker
+    batch_size    -> model.encode batch size inside each worker
+    shard_size    -> texts sent to a worker per task
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBED_MODEL,
+        num_workers: int = None,
+        torch_threads: int = 1,
+        batch_size: int = 64,
+        shard_size: int = 512,
+    ):
+        self.model_name = model_name
+        self.torch_threads = torch_threads
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // torch_threads)
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        self._dim = None
+
+        # spawn: forking a process that already imported torch is not safe
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, torch_threads),
+        )
+
+    def encode(self, texts, batch_size: int = None, convert_to_numpy: bool = True, normalize_embeddings: bool = True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+
+        shards = [
+            (texts[start:start + self.shard_size], batch_size, normalize_embeddings)
+            for start in range(0, len(texts), self.shard_size)
+        ]
+        if not shards:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype="float32")
+
+        # executor.map yields results in submission order -> output order == input order
+        return np.concatenate(list(self.pool.map(_encode_shard, shards)), axis=0)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = self.encode(["dimension probe"]).shape[1]
+        return self._dim
+
+    def warm_up(self):
+        """Make every worker load its model now (instead of on first encode)."""
+        probes = [(["warm up"], 1, True)] * self.num_workers
+        list(self.pool.map(_encode_shard, probes))
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,127 @@
+# rag/quantized.py
+
+"""
+Compressed Embedding Storage
+
+Index variants that store each vector in fewer bytes than float32:
+
+- "float32" -> IndexFlatIP, 4 bytes / dim (baseline)
+- "float16" -> IndexScalarQuantizer(QT_fp16), 2 bytes / dim
+- "int8"    -> IndexScalarQuantizer(QT_8bit), 1 byte / dim (trained per-dim ranges)
+- "binary"  -> IndexBinaryFlat on sign bits, 1 bit / dim, Hamming search
+               followed by a float rerank of the top candidates
+
+All variants expose `search(query_embeddings, k)` with the same
+(scores, ids) return shape as a FAISS index, so retrieval code can use them
+unchanged.
+"""
+
+import faiss
+import numpy as np
+
+
+STORAGE_MODES = ("float32", "float16", "int8", "binary")
+
+
+def binarize(embeddings: np.ndarray) -> np.ndarray:
+    """Sign bit per dimension, packed 8 dims per byte -> (n, dim / 8) uint8."""
+    return np.packbits(embeddings > 0, axis=1)
+
+
+class ScalarQuantizedIndex:
+    """float32 / float16 / int8 storage behind one FAISS index."""
+
+    QUANTIZERS = {
+        "float16": faiss.ScalarQuantizer.QT_fp16,
+        "int8": faiss.ScalarQuantizer.QT_8bit,
+    }
+
+    def __init__(self, embeddings: np.ndarray, mode: str = "int8"):
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        dim = embeddings.shape[1]
+        self.mode = mode
+
+        if mode == "float32":
+            self.index = faiss.IndexFlatIP(dim)
+        else:
+            self.index = faiss.IndexScalarQuantizer(dim, self.QUANTIZERS[mode], faiss.METRIC_INNER_PRODUCT)
+            self.index.train(embeddings)  # learns per-dim min/max for int8 (no-op for fp16)
+        self.index.add(embeddings)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def bytes_per_vector(self) -> int:
+        if self.mode == "float32":
+            return self.index.d * 4
+        return self.index.code_size
+
+    def search(self, query_embeddings: np.ndarray, k: int = 3):
+        return self.index.search(np.ascontiguousarray(query_embeddings, dtype="float32"), k)
+
+
+class BinaryRerankIndex:
+    """
+    Hamming search over 1-bit codes, then exact inner-product rerank of the
+    top (k * rerank_factor) candidates.
+
+    rerank_vectors only has to support row indexing, so it can be a float16
+    array, or a np.memmap that stays on disk and is read row by row.
+    """
+
+    def __init__(self, embeddings: np.ndarray, rerank_factor: int = 10, rerank_vectors=None):
+        dim = embeddings.shape[1]
+        if dim % 8:
+            raise ValueError(f"binary codes need dim divisible by 8, got {dim}")
+
+        self.index = faiss.IndexBinaryFlat(dim)
+        self.index.add(binarize(embeddings))
+        self.rerank_factor = rerank_factor
+        self.rerank_vectors = (
+            rerank_vectors if rerank_vectors is not None else embeddings.astype("float16")
+        )
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def bytes_per_vector(self) -> int:
+        """Bytes held by the binary index (the rerank store is reported separately)."""
+        return self.index.code_size
+
+    @property
+    def rerank_bytes_per_vector(self) -> int:
+        return self.rerank_vectors.dtype.itemsize * self.rerank_vectors.shape[1]
+
+    def search(self, query_embeddings: np.ndarray, k: int = 3):
+        query_embeddings = np.asarray(query_embeddings, dtype="float32")
+        num_candidates = min(max(k * self.rerank_factor, k), self.ntotal)
+        _, candidates = self.index.search(binarize(query_embeddings), num_candidates)
+
+        scores = np.full((len(query_embeddings), k), -np.inf, dtype="float32")
+        ids = np.full((len(query_embeddings), k), -1, dtype="int64")
+
+        for row, (query, cand) in enumerate(zip(query_embeddings, candidates)):
+            cand = cand[cand != -1]
+            if len(cand) == 0:
+                continue
+            # sorted rows keep memmap reads sequential
+            cand = np.sort(cand)
+            exact = np.asarray(self.rerank_vectors[cand], dtype="float32") @ query
+            top = np.argsort(-exact)[:k]
+            scores[row, :len(top)] = exact[top]
+            ids[row, :len(top)] = cand[top]
+
+        return scores, ids
+
+
+def build_quantized_index(embeddings: np.ndarray, mode: str = "int8", **kwargs):
+    """Build the index for one of STORAGE_MODES."""
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode={mode!r}, expected one of {STORAGE_MODES}")
+    if mode == "binary":
+        return BinaryRerankIndex(embeddings, **kwargs)
+    return ScalarQuantizedIndex(embeddings, mode)
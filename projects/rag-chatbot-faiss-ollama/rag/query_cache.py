@@ -0,0 +1,127 @@
+# rag/query_cache.py
+
+"""
+Query Cache
+
+In-process caches for the interactive apps, where the same questions come
+in over and over:
+
+- query embeddings: normalized query text -> embedding
+- results:          (normalized query, k, index version, MMR lambda) -> retrieved chunks
+
+Both are LRU with a max size and a TTL, and count hits / misses. Results are
+only cached under an explicit index version (the manifest hash of a
+persisted index, or IncrementalIndex.version); without one every call
+searches the index.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .core import embed_texts
+from .mmr import mmr_search
+
+
+def normalize_query(query: str) -> str:
+    """Case / whitespace differences should not cause a cache miss."""
+    return " ".join(query.lower().split())
+
+
+class LRUCache:
+    """Thread-safe LRU with size and TTL eviction."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                stored_at, value = item
+                if time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def default_index_version(index):
+    """The index's own version counter (IncrementalIndex), None for a plain FAISS index."""
+    return getattr(index, "version", None)
+
+
+class QueryCache:
+    """Embedding cache + results cache in front of retrieve_top_chunks."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.embeddings = LRUCache(max_size, ttl_seconds)
+        self.results = LRUCache(max_size, ttl_seconds)
+
+    def embed_query(self, model, query: str):
+        """(1, dim) query embedding, computed at most once per normalized query."""
+        key = normalize_query(query)
+        q_emb = self.embeddings.get(key)
+        if q_emb is None:
+            q_emb = embed_texts(model, [key])  # MiniLM is uncased, lowercasing is lossless
+            self.embeddings.put(key, q_emb)
+        return q_emb
+
+    def retrieve_top_chunks(self, index, model, query: str, chunks, k: int = 3, index_version=None, mmr_lambda: float = None):
+        """
+        Returns [(chunk_id, score, chunk_text), ...], served from cache on repeats.
+        index_version -> must change whenever the index content does (e.g. manifest_version);
+                         None = index.version if it has one, else the results aren't cached.
+        mmr_lambda -> pick k diverse chunks from the top candidates (rag.mmr), None = plain top-k.
+        """
+        if index_version is None:
+            index_version = default_index_version(index)
+        key = (normalize_query(query), k, index_version, mmr_lambda)
+
+        results = self.results.get(key) if index_version is not None else None
+        if results is None:
+            if mmr_lambda is None:
+                scores, ids = index.search(self.embed_query(model, query), k)
+            else:
+                scores, ids = mmr_search(index, self.embed_query(model, query), k, lambda_mult=mmr_lambda)
+            results = [
+                (int(idx), float(score), chunks[int(idx)])
+                for idx, score in zip(ids[0], scores[0])
+                if idx != -1
+            ]
+            if index_version is not None:
+                self.results.put(key, results)
+        return list(results)
+
+    def stats(self) -> dict:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
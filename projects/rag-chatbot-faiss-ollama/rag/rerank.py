@@ -0,0 +1,97 @@
+# rag/rerank.py
+
+"""
+Cross-Encoder Reranking
+
+Second retrieval stage: FAISS (or hybrid) returns the top N candidates
+(e.g. 50), a small local cross-encoder rescores (question, chunk) pairs in
+batches on CPU, and only the best k go to the LLM. Better top-3 precision
+means a smaller k and a shorter prompt.
+
+The stage has a millisecond budget. Before each batch we check whether it
+can still finish in time (using the last batch's duration); if not, or if
+the budget was blown anyway, the dense order is returned unchanged.
+"""
+
+import time
+
+import numpy as np
+
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_RERANK_CANDIDATES = 50
+
+
+class CrossEncoderReranker:
+    """
+    model_name -> sentence-transformers CrossEncoder to load (CPU)
+    budget_ms  -> max time for one rerank call before falling back
+    batch_size -> (question, chunk) pairs scored per forward pass
+    model      -> an already loaded model with predict(pairs, ...) (skips loading)
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        budget_ms: float = 150.0,
+        batch_size: int = 16,
+        max_length: int = 256,
+        model=None,
+    ):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.model = model
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.reranked = 0
+        self.fallbacks = 0
+        self.last_ms = 0.0
+        self.last_reranked = False
+
+    def rerank(self, query: str, candidates, k: int = 3, budget_ms: float = None):
+        """
+        candidates: [(chunk_id, score, chunk_text), ...] in dense order.
+        Returns the top k as [(chunk_id, rerank_score, chunk_text), ...], or
+        candidates[:k] unchanged if the budget ran out.
+        """
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000.0
+        start = time.perf_counter()
+
+        scores = []
+        batch_seconds = 0.0
+        over_budget = False
+        for i in range(0, len(candidates), self.batch_size):
+            if time.perf_counter() - start + batch_seconds > budget:
+                over_budget = True
+                break
+            batch_start = time.perf_counter()
+            batch = candidates[i:i + self.batch_size]
+            batch_scores = self.model.predict(
+                [(query, text) for _, _, text in batch],
+                batch_size=len(batch),
+                show_progress_bar=False,
+            )
+            scores.extend(np.asarray(batch_scores, dtype="float32").reshape(-1).tolist())
+            batch_seconds = time.perf_counter() - batch_start
+
+        self.last_ms = (time.perf_counter() - start) * 1000.0
+        if over_budget or self.last_ms > budget * 1000.0:
+            self.fallbacks += 1
+            self.last_reranked = False
+            return list(candidates[:k])
+
+        self.reranked += 1
+        self.last_reranked = True
+        order = np.argsort(-np.asarray(scores), kind="stable")[:k]
+        return [(candidates[i][0], float(scores[i]), candidates[i][2]) for i in order]
+
+    def stats(self) -> dict:
+        total = self.reranked + self.fallbacks
+        return {
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": self.fallbacks / total if total else 0.0,
+            "last_ms": self.last_ms,
+        }
@@ -0,0 +1,320 @@
+# rag/sparse.py
+
+"""
+Sparse (BM25) Retrieval + Hybrid Fusion
+
+Dense retrieval is good at paraphrases but misses exact keywords (error
+codes, product names, identifiers). This module adds a BM25 inverted index
+over the same chunk ids as the FAISS index, and fuses both ranked lists
+with reciprocal-rank fusion (RRF).
+
+Postings are stored CSR-style in three flat numpy arrays:
+- offsets  -> postings of term t are [offsets[t], offsets[t + 1])
+- doc_ids  -> int32 chunk ids
+- weights  -> float32 precomputed BM25 contribution of (term, chunk)
+
+so a query is a few array slices + one bincount over the touched postings,
+independent of corpus size. Persisted next to the FAISS index as
+bm25.npz + bm25_vocab.json.
+
+build() holds every posting in RAM. build_on_disk() writes the same files
+for corpora that don't fit: postings are sorted in blocks of `block_docs`
+chunks, spilled to disk and scattered into memory-mapped CSR arrays, so
+only the vocabulary and one block are in memory.
+"""
+
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from .ann import search
+from .core import embed_texts
+
+
+POSTINGS_FILE = "bm25.npz"
+VOCAB_FILE = "bm25_vocab.json"
+DEFAULT_RRF_K = 60
+DEFAULT_BUILD_BLOCK_DOCS = 65536
+
+# keeps codes like "err-404", "v2.1" or "snake_case" together as one token
+TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[-.][a-z0-9_]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    k1 -> term frequency saturation
+    b  -> document length normalization
+    """
+
+    def __init__(self, vocab: dict, offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray, num_docs: int, k1: float = 1.5, b: float = 0.75):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.num_docs = num_docs
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """texts: any iterable of chunk strings, position = chunk id."""
+        vocab = {}
+        term_ids, doc_ids, tfs, doc_lens = [], [], [], []
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        num_docs = len(doc_lens)
+        term_ids = np.asarray(term_ids, dtype="int64")
+        doc_ids = np.asarray(doc_ids, dtype="int32")
+        tfs = np.asarray(tfs, dtype="float32")
+        doc_lens = np.asarray(doc_lens, dtype="float32")
+
+        # group postings by term (stable -> chunk ids stay ascending)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        df = np.bincount(term_ids, minlength=len(vocab))
+        offsets = np.zeros(len(vocab) + 1, dtype="int64")
+        np.cumsum(df, out=offsets[1:])
+
+        avg_len = float(doc_lens.mean()) if num_docs else 0.0
+        idf = np.log1p((num_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        length_norm = k1 * (1 - b + b * doc_lens[doc_ids] / max(avg_len, 1e-9))
+        weights = (idf[term_ids] * tfs * (k1 + 1) / (tfs + length_norm)).astype("float32")
+
+        return cls(vocab, offsets, doc_ids, weights, num_docs, k1, b)
+
+    @classmethod
+    def build_on_disk(cls, texts, store_dir: str, block_docs: int = DEFAULT_BUILD_BLOCK_DOCS, k1: float = 1.5, b: float = 0.75) -> dict:
+        """
+        Same postings as build(texts).save(store_dir), built in bounded memory:
+        RAM holds the vocabulary (+ a few arrays per term) and one block of
+        `block_docs` chunks. Returns {"docs", "terms", "postings"}.
+        """
+        work = Path(store_dir) / ".bm25_build"
+        shutil.rmtree(work, ignore_errors=True)
+        work.mkdir(parents=True)
+        try:
+            # pass 1: per block, postings sorted by term -> one run file each
+            vocab, runs = {}, []
+            df = np.zeros(0, dtype="int64")
+            num_docs = 0
+            total_len = 0.0
+            with open(work / "doc_lens.bin", "wb") as lens_file:
+                for block in _blocks(texts, block_docs):
+                    term_ids, doc_ids, tfs, doc_lens = [], [], [], []
+                    for doc_id, text in enumerate(block, start=num_docs):
+                        counts = Counter(tokenize(text))
+                        doc_lens.append(sum(counts.values()))
+                        for term, tf in counts.items():
+                            term_ids.append(vocab.setdefault(term, len(vocab)))
+                            doc_ids.append(doc_id)
+                            tfs.append(tf)
+                    term_ids = np.asarray(term_ids, dtype="int64")
+                    order = np.argsort(term_ids, kind="stable")
+                    run = work / f"run{len(runs)}.npz"
+                    np.savez(
+                        run,
+                        term_ids=term_ids[order],
+                        doc_ids=np.asarray(doc_ids, dtype="int32")[order],
+                        tfs=np.asarray(tfs, dtype="float32")[order],
+                    )
+                    runs.append(run)
+                    df = np.pad(df, (0, len(vocab) - len(df)))
+                    df += np.bincount(term_ids, minlength=len(vocab))
+                    lens_file.write(np.asarray(doc_lens, dtype="float32").tobytes())
+                    total_len += float(sum(doc_lens))
+                    num_docs += len(block)
+
+            offsets = np.zeros(len(vocab) + 1, dtype="int64")
+            np.cumsum(df, out=offsets[1:])
+            total = int(offsets[-1])
+            doc_ids_out = np.lib.format.open_memmap(work / "doc_ids.npy", mode="w+", dtype="int32", shape=(total,))
+            weights_out = np.lib.format.open_memmap(work / "weights.npy", mode="w+", dtype="float32", shape=(total,))
+
+            # pass 2: runs are in chunk-id order, so appending each run's
+            # postings behind the previous ones keeps every term's ids ascending
+            cursor = offsets[:-1].copy()
+            for run in runs:
+                with np.load(run) as data:
+                    term_ids, doc_ids, tfs = data["term_ids"], data["doc_ids"], data["tfs"]
+                counts = np.bincount(term_ids, minlength=len(vocab))
+                group_start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                positions = cursor[term_ids] + np.arange(len(term_ids)) - group_start[term_ids]
+                doc_ids_out[positions] = doc_ids
+                weights_out[positions] = tfs  # raw tf for now, turned into weights below
+                cursor += counts
+                run.unlink()
+
+            # pass 3: tf -> BM25 weight, block by block over the postings
+            doc_lens = np.memmap(work / "doc_lens.bin", dtype="float32", mode="r", shape=(num_docs,)) if num_docs else np.empty(0, dtype="float32")
+            avg_len = total_len / num_docs if num_docs else 0.0
+            idf = np.log1p((num_docs - df + 0.5) / (df + 0.5)).astype("float32")
+            step = block_docs * 16  # postings per block
+            for start in range(0, total, step):
+                end = min(start + step, total)
+                term_ids = np.searchsorted(offsets, np.arange(start, end), side="right") - 1
+                tfs = np.asarray(weights_out[start:end])
+                length_norm = k1 * (1 - b + b * doc_lens[doc_ids_out[start:end]] / max(avg_len, 1e-9))
+                weights_out[start:end] = idf[term_ids] * tfs * (k1 + 1) / (tfs + length_norm)
+            weights_out.flush()
+            doc_ids_out.flush()
+
+            cls(vocab, offsets, doc_ids_out, weights_out, num_docs, k1, b).save(store_dir)
+            del doc_ids_out, weights_out, doc_lens
+            return {"docs": num_docs, "terms": len(vocab), "postings": total}
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def search(self, query: str, k: int = 3, mask: np.ndarray = None) -> list[tuple[int, float]]:
+        """
+        [(chunk_id, bm25_score), ...] best first; chunks without any query term
+        are not returned. mask: optional boolean filter over chunk ids.
+        """
+        slices = [
+            (self.offsets[t], self.offsets[t + 1])
+            for t in (self.vocab.get(term) for term in set(tokenize(query)))
+            if t is not None
+        ]
+        if not slices:
+            return []
+
+        ids = np.concatenate([self.doc_ids[start:end] for start, end in slices])
+        weights = np.concatenate([self.weights[start:end] for start, end in slices])
+        if mask is not None:
+            keep = mask[ids]
+            ids, weights = ids[keep], weights[keep]
+            if len(ids) == 0:
+                return []
+        if len(slices) > 1:
+            ids, inverse = np.unique(ids, return_inverse=True)
+            weights = np.bincount(inverse, weights=weights)
+
+        if len(ids) > k:
+            top = np.argpartition(-weights, k - 1)[:k]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.lexsort((ids[top], -weights[top]))]  # ties -> lower chunk id first
+        return [(int(ids[i]), float(weights[i])) for i in top]
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def save(self, store_dir: str):
+        store = Path(store_dir)
+        store.mkdir(parents=True, exist_ok=True)
+
+        tmp = store / (POSTINGS_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                weights=self.weights,
+                params=np.array([self.num_docs, self.k1, self.b], dtype="float64"),
+            )
+        os.replace(tmp, store / POSTINGS_FILE)
+
+        terms = [None] * len(self.vocab)
+        for term, term_id in self.vocab.items():
+            terms[term_id] = term
+        tmp = store / (VOCAB_FILE + ".tmp")
+        tmp.write_text(json.dumps(terms, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, store / VOCAB_FILE)
+
+    @classmethod
+    def load(cls, store_dir: str):
+        """The persisted index, or None if missing / unreadable."""
+        store = Path(store_dir)
+        try:
+            terms = json.loads((store / VOCAB_FILE).read_text(encoding="utf-8"))
+            with np.load(store / POSTINGS_FILE) as data:
+                offsets, doc_ids, weights, params = data["offsets"], data["doc_ids"], data["weights"], data["params"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if len(offsets) != len(terms) + 1:
+            return None
+        vocab = {term: term_id for term_id, term in enumerate(terms)}
+        return cls(vocab, offsets, doc_ids, weights, int(params[0]), float(params[1]), float(params[2]))
+
+
+def _blocks(items, size: int):
+    block = []
+    for item in items:
+        block.append(item)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def load_or_build_bm25(store_dir: str, chunks) -> BM25Index:
+    """Persisted BM25 index for the chunks in store_dir (built + saved if missing or stale)."""
+    bm25 = BM25Index.load(store_dir)
+    if bm25 is None or len(bm25) != len(chunks):
+        bm25 = BM25Index.build(chunks)
+        bm25.save(store_dir)
+    return bm25
+
+
+# -------------------------
+# Fusion
+# -------------------------
+def reciprocal_rank_fusion(ranked_lists, rrf_k: int = DEFAULT_RRF_K, top_k: int = None) -> list[tuple[int, float]]:
+    """
+    ranked_lists: lists of chunk ids, best first.
+    score(id) = sum over lists of 1 / (rrf_k + rank), rank starting at 1.
+    """
+    scores = {}
+    for ranked in ranked_lists:
+        for rank, chunk_id in enumerate(ranked, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return fused[:top_k] if top_k else fused
+
+
+def hybrid_retrieve_batch(index, model, bm25: BM25Index, queries: list[str], chunks, k: int = 3, candidates: int = 20, rrf_k: int = DEFAULT_RRF_K, query_embeddings=None, mask=None):
+    """
+    Dense top-`candidates` + BM25 top-`candidates` per query, fused with RRF.
+    mask: optional boolean filter over chunk ids, applied inside both searches.
+    Returns one [(chunk_id, rrf_score, chunk_text), ...] list per query, best first.
+    """
+    if not queries:
+        return []
+    candidates = max(candidates, k)
+    if query_embeddings is None:
+        query_embeddings = embed_texts(model, list(queries))
+    if mask is None:
+        _, dense_ids = index.search(query_embeddings, candidates)
+    else:
+        _, dense_ids = search(index, query_embeddings, candidates, mask=mask)
+
+    results = []
+    for query, row in zip(queries, dense_ids):
+        dense = [int(idx) for idx in row if idx != -1]
+        sparse = [chunk_id for chunk_id, _ in bm25.search(query, candidates, mask=mask)]
+        fused = reciprocal_rank_fusion([dense, sparse], rrf_k=rrf_k, top_k=k)
+        results.append([(chunk_id, score, chunks[chunk_id]) for chunk_id, score in fused])
+    return results
+
+
+def hybrid_search(index, model, bm25: BM25Index, query: str, chunks, k: int = 3, candidates: int = 20, rrf_k: int = DEFAULT_RRF_K, query_embedding=None, mask=None):
+    """Single-query hybrid_retrieve_batch; pass query_embedding to reuse a cached one."""
+    return hybrid_retrieve_batch(index, model, bm25, [query], chunks, k, candidates, rrf_k, query_embeddings=query_embedding, mask=mask)[0]
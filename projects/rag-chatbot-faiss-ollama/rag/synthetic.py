@@ -0,0 +1,162 @@
+# rag/synthetic.py
+
+"""
+Synthetic Corpus + Query Generator
+
+Deterministic (seeded) corpus of any size, from 1k to 10M+ chunks, for
+scaling benchmarks:
+
+- pseudo-words with a Zipf frequency distribution, like natural text
+- every chunk belongs to a topic and mixes topic words with common words,
+  so embeddings form clusters the way real documents do
+- gold passages are planted in chosen chunks: "The <attribute> of <entity>
+  is <code>." with a matching question per gold chunk
+
+Chunks are generated in fixed-size blocks, each from its own seed, so any
+range of chunk ids can be produced independently and nothing has to be
+held in memory. Queries use the eval-set format of 12_eval_retrieval_precision.py
+({"id", "question", "gold_contains"}) plus the planted "gold_id".
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+BLOCK_SIZE = 10_000
+SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+ATTRIBUTES = ["access code", "release tag", "error code", "owner id", "budget code", "ticket number"]
+
+# SeedSequence spawn keys for the independent random streams
+_VOCAB, _TOPICS, _GOLD, _BLOCK, _FACTS = range(5)
+
+
+class SyntheticCorpus:
+    """
+    num_chunks      -> corpus size
+    num_queries     -> planted gold passages / questions
+    words_per_chunk -> ~6 chars per word, 32 words ~ the default 200-char chunk
+    topic_share     -> fraction of words drawn from the chunk's topic
+    """
+
+    def __init__(
+        self,
+        num_chunks: int,
+        seed: int = 0,
+        num_queries: int = 1000,
+        words_per_chunk: int = 32,
+        vocab_size: int = 20_000,
+        num_topics: int = None,
+        topic_words: int = 64,
+        topic_share: float = 0.5,
+    ):
+        self.num_chunks = num_chunks
+        self.seed = seed
+        self.num_queries = min(num_queries, num_chunks)
+        self.words_per_chunk = words_per_chunk
+        self.num_topics = num_topics or max(8, int(np.sqrt(num_chunks)))
+        self.topic_share = topic_share
+
+        rng = self._rng(_VOCAB)
+        vocab = set()
+        while len(vocab) < vocab_size:
+            vocab.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 4))))
+        self.vocab = np.array(sorted(vocab))
+        rng.shuffle(self.vocab)  # rank in the Zipf distribution = position after shuffle
+
+        ranks = np.arange(1, vocab_size + 1)
+        self.word_cdf = np.cumsum(1.0 / ranks ** 1.1)
+        self.word_cdf /= self.word_cdf[-1]
+
+        self.topics = self._rng(_TOPICS).integers(0, vocab_size, size=(self.num_topics, topic_words))
+
+        # gold chunk ids (sorted) and the question each one answers
+        rng = self._rng(_GOLD)
+        self.gold_ids = np.sort(rng.choice(num_chunks, size=self.num_queries, replace=False))
+        self.gold_query = rng.permutation(self.num_queries)
+
+    def _rng(self, *key):
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=key))
+
+    def __len__(self) -> int:
+        return self.num_chunks
+
+    # -------------------------
+    # Gold facts / queries
+    # -------------------------
+    def fact(self, query_id: int):
+        """(entity, attribute, code) planted for query_id, derived from the seed alone."""
+        rng = self._rng(_FACTS, query_id)
+        entity = "-".join(rng.choice(self.vocab[:5000], size=2))
+        attribute = ATTRIBUTES[query_id % len(ATTRIBUTES)]
+        code = f"{''.join(rng.choice(list('ABCDEFGHJKLMNPQRSTUVWXYZ'), size=2))}-{query_id:06d}"
+        return entity, attribute, code
+
+    def queries(self) -> list[dict]:
+        items = []
+        for gold_id, query_id in zip(self.gold_ids, self.gold_query):
+            entity, attribute, code = self.fact(int(query_id))
+            items.append({
+                "id": f"q{int(query_id)}",
+                "question": f"What is the {attribute} of {entity}?",
+                "gold_contains": code,
+                "gold_id": int(gold_id),
+            })
+        items.sort(key=lambda item: int(item["id"][1:]))
+        return items
+
+    # -------------------------
+    # Chunks
+    # -------------------------
+    def _block(self, block: int) -> list[str]:
+        start = block * BLOCK_SIZE
+        stop = min(start + BLOCK_SIZE, self.num_chunks)
+        n, w = stop - start, self.words_per_chunk
+        rng = self._rng(_BLOCK, block)
+
+        topic = rng.integers(0, self.num_topics, size=n)
+        topic_pick = rng.integers(0, self.topics.shape[1], size=(n, w))
+        common = np.searchsorted(self.word_cdf, rng.random((n, w)))
+        use_topic = rng.random((n, w)) < self.topic_share
+        words = self.vocab[np.where(use_topic, self.topics[topic][np.arange(n)[:, None], topic_pick], common)]
+
+        texts = [" ".join(row) for row in words.tolist()]
+
+        lo, hi = np.searchsorted(self.gold_ids, [start, stop])
+        for g in range(lo, hi):
+            entity, attribute, code = self.fact(int(self.gold_query[g]))
+            i = int(self.gold_ids[g]) - start
+            half = len(texts[i]) // 2
+            texts[i] = f"{texts[i][:half]}. The {attribute} of {entity} is {code}. {texts[i][half:]}"
+        return texts
+
+    def iter_chunks(self, start: int = 0, stop: int = None):
+        """Chunk texts for ids [start, stop), generated block by block."""
+        stop = self.num_chunks if stop is None else min(stop, self.num_chunks)
+        for block in range(start // BLOCK_SIZE, (stop + BLOCK_SIZE - 1) // BLOCK_SIZE):
+            block_start = block * BLOCK_SIZE
+            texts = self._block(block)
+            yield from texts[max(start - block_start, 0):stop - block_start]
+
+    def chunks(self, start: int = 0, stop: int = None) -> list[str]:
+        return list(self.iter_chunks(start, stop))
+
+    # -------------------------
+    # On disk
+    # -------------------------
+    def write(self, out_dir: str, chunks_per_file: int = 100_000):
+        """
+        corpus_00000.txt, ... (chunks separated by blank lines, readable by
+        rag.ingest / rag.corpus) + queries.jsonl.
+        """
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        for file_no, start in enumerate(range(0, self.num_chunks, chunks_per_file)):
+            with open(out / f"corpus_{file_no:05d}.txt", "w", encoding="utf-8") as f:
+                for text in self.iter_chunks(start, start + chunks_per_file):
+                    f.write(text)
+                    f.write("\n\n")
+        with open(out / "queries.jsonl", "w", encoding="utf-8") as f:
+            for item in self.queries():
+                f.write(json.dumps(item) + "\n")
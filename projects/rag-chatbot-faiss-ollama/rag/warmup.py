@@ -0,0 +1,132 @@
+# rag/warmup.py
+
+"""
+Startup Warm-Up
+
+Without it, the first question after a cold start pays for:
+
+- loading the Ollama model weights (seconds for a 3B model), and again
+  after every idle gap longer than keep_alive
+- the embedding model's first forward pass (lazy init, allocator growth),
+  and the cross-encoder's, which can push a first rerank past its budget
+
+warm_up(...) pays for these while the app starts. It preloads the LLM
+with an empty prompt, pinned with keep_alive ($OLLAMA_KEEP_ALIVE, -1 =
+until the server stops), and runs each local model once on a dummy input.
+StartupTimer reports startup and the first query separately, so cold-start
+regressions are visible.
+"""
+
+import time
+from contextlib import contextmanager
+
+from .core import embed_texts
+from .ollama_client import DEFAULT_OLLAMA_MODEL, OllamaError, get_client
+
+
+def warm_up(embed_model, ollama_model: str = DEFAULT_OLLAMA_MODEL, keep_alive=None, client=None, reranker=None) -> dict:
+    """
+    Returns timings in ms: embed_warmup_ms, rerank_warmup_ms (with a
+    reranker), llm_preload_ms (wall clock) and llm_load_ms (Ollama's
+    load_duration, ~0 if the model was already resident), plus the
+    keep_alive sent with the preload (client default when None).
+    An unreachable Ollama is reported in "llm_error" instead of raised, so the
+    app still starts and the first question shows the usual error.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    embed_texts(embed_model, ["warm-up query"])
+    timings["embed_warmup_ms"] = (time.perf_counter() - start) * 1000
+
+    if reranker is not None:
+        start = time.perf_counter()
+        reranker.model.predict([("warm-up query", "warm-up passage")], show_progress_bar=False)
+        timings["rerank_warmup_ms"] = (time.perf_counter() - start) * 1000
+
+    client = client or get_client()
+    timings["keep_alive"] = client.keep_alive if keep_alive is None else keep_alive
+    start = time.perf_counter()
+    try:
+        response = client.preload(ollama_model, keep_alive=keep_alive)
+    except OllamaError as exc:
+        timings["llm_error"] = str(exc)
+        return timings
+    timings["llm_preload_ms"] = (time.perf_counter() - start) * 1000
+    timings["llm_load_ms"] = response.get("load_duration", 0) / 1e6
+    return timings
+
+
+def format_warmup(timings: dict, ollama_model: str = DEFAULT_OLLAMA_MODEL) -> str:
+    parts = [f"embedding {timings['embed_warmup_ms']:.0f} ms"]
+    if "rerank_warmup_ms" in timings:
+        parts.append(f"rerank {timings['rerank_warmup_ms']:.0f} ms")
+    if "llm_error" in timings:
+        parts.append(f"{ollama_model} NOT preloaded ({timings['llm_error']})")
+    else:
+        parts.append(
+            f"{ollama_model} ready in {timings['llm_preload_ms']:.0f} ms "
+            f"(load {timings['llm_load_ms']:.0f} ms, keep_alive={timings['keep_alive']})"
+        )
+    return "🔥 Warm-up: " + " | ".join(parts)
+
+
+class StartupTimer:
+    """
+    Created when the app starts:
+
+        timer = StartupTimer()
+        with timer.stage("index"): ...
+        timer.ready()
+        with timer.query():                       # first query is recorded
+            echo_stream(timer.stream(tokens))     # + its time to first token
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.ready_ms = None
+        self.first_query_ms = None
+        self.first_token_ms = None
+        self._query_start = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.stages[name] = (time.perf_counter() - start) * 1000
+
+    def ready(self) -> float:
+        self.ready_ms = (time.perf_counter() - self.start) * 1000
+        return self.ready_ms
+
+    @contextmanager
+    def query(self):
+        first = self.first_query_ms is None
+        self._query_start = time.perf_counter()
+        yield
+        if first:
+            self.first_query_ms = (time.perf_counter() - self._query_start) * 1000
+
+    def stream(self, tokens):
+        """Pass-through token generator; records time to first token of the first query."""
+        for token in tokens:
+            if self.first_query_ms is None and self.first_token_ms is None and self._query_start is not None:
+                self.first_token_ms = (time.perf_counter() - self._query_start) * 1000
+            yield token
+
+    def summary(self) -> dict:
+        return {
+            "stages_ms": dict(self.stages),
+            "ready_ms": self.ready_ms,
+            "first_query_ms": self.first_query_ms,
+            "first_token_ms": self.first_token_ms,
+        }
+
+    def startup_report(self) -> str:
+        stages = " | ".join(f"{name} {ms:.0f} ms" for name, ms in self.stages.items())
+        return f"⏱️ Startup: {self.ready_ms:.0f} ms ({stages})"
+
+    def first_query_report(self) -> str:
+        first_token = f", first token {self.first_token_ms:.0f} ms" if self.first_token_ms is not None else ""
+        return f"⏱️ First query: {self.first_query_ms:.0f} ms{first_token}"